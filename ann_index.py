@@ -0,0 +1,339 @@
+# ann_index.py
+"""
+Approximate nearest-neighbour index for semantic retrieval
+Inverted-file (IVF) index with spherical k-means partitions, pure NumPy
+"""
+
+import copy
+import numpy as np
+from quantization import QuantizedMatrix, RowBuffer
+
+
+def normalize_rows(vectors):
+    """Return float32 copies of vectors scaled to unit L2 norm (zero rows stay zero)"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores, k, threshold=None):
+    """
+    Indices of the k largest scores, sorted descending, without a full sort
+    If threshold is given, scores below it are masked out before selection
+    """
+    if threshold is not None:
+        eligible = np.flatnonzero(scores >= threshold)
+        return eligible[top_k_indices(scores[eligible], k)]
+
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        part = np.argpartition(-scores, k - 1)[:k]
+    else:
+        part = np.arange(len(scores))
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def _as_unit_float32(vectors, normalized):
+    """Use already-normalized float32 input as is, otherwise normalize a copy"""
+    if normalized and isinstance(vectors, np.ndarray) and vectors.dtype == np.float32:
+        return vectors
+    return normalize_rows(vectors)
+
+
+class IVFIndex:
+    """
+    Inverted-file index over unit-normalised embeddings.
+
+    Vectors are partitioned into nlist clusters with spherical k-means. A query
+    scores only the centroids, then the members of the nprobe closest clusters,
+    so its cost is roughly O(nlist·d + nprobe·N/nlist·d) instead of O(N·d).
+
+    Knobs:
+        nlist: number of partitions (default: ~sqrt(N) at training time)
+        nprobe: partitions visited per query; higher = better recall, slower
+        exact_threshold: below this many vectors the index stays untrained and
+            every query is an exact brute-force scan
+        precision: storage precision of the indexed vectors
+            ("float32", "float16" or "int8", see quantization.QuantizedMatrix)
+    """
+
+    def __init__(self, nlist=None, nprobe=8, exact_threshold=20_000,
+                 kmeans_iters=10, train_sample=50_000, seed=0, precision="float32"):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.exact_threshold = exact_threshold
+        self.kmeans_iters = kmeans_iters
+        self.train_sample = train_sample
+        self.seed = seed
+        self.store = QuantizedMatrix(precision)
+        self.centroids = None
+        self.lists = []
+        self._trained_size = 0
+
+    def __len__(self):
+        return len(self.store)
+
+    @property
+    def vectors(self):
+        """The stored unit-norm float32 matrix (None for compact precisions)"""
+        return self.store.data if self.store.precision == "float32" else None
+
+    @property
+    def is_exact(self):
+        """True while queries fall back to an exact scan"""
+        return self.centroids is None
+
+    def copy(self):
+        """
+        Copy that can be extended without affecting this index
+        Stored rows are shared (see quantization.RowBuffer); other arrays are
+        replaced rather than modified in place, so they are shared too
+        """
+        clone = copy.copy(self)
+        clone.store = self.store.copy()
+        clone.lists = list(self.lists)
+        return clone
+
+    def build(self, vectors, normalized=False, partition=True):
+        """
+        (Re)build the index from scratch for the given embedding matrix
+        Pass normalized=True for unit-norm float32 input to skip normalizing a copy
+        partition=False only stores the vectors (no k-means training), for
+        callers that search another way above exact_threshold
+        """
+        vectors = _as_unit_float32(vectors, normalized)
+        self.store.set(vectors)
+        self.centroids = None
+        self.lists = []
+        if partition and len(self) >= self.exact_threshold:
+            self._train(vectors)
+
+    def add(self, vectors, normalized=False, partition=True):
+        """
+        Append new vectors; ids continue from the current size
+        partition=False only stores them and drops any existing partitioning (see build)
+        """
+        new_vectors = _as_unit_float32(vectors, normalized)
+        if len(self) == 0:
+            self.build(new_vectors, normalized=True, partition=partition)
+            return
+
+        start = len(self)
+        self.store.append(new_vectors)
+
+        if not partition:
+            self.centroids = None
+            self.lists = []
+        elif self.is_exact:
+            if len(self) >= self.exact_threshold:
+                self._train()
+        elif len(self) > 4 * self._trained_size:
+            # Corpus outgrew the partitioning it was trained on
+            self._train()
+        else:
+            self._assign_to_lists(np.arange(start, len(self)), new_vectors)
+
+    def _train(self, vectors=None):
+        """
+        Fit spherical k-means centroids and fill the inverted lists
+        vectors: full float32 matrix if at hand, otherwise rows are read back from the store
+        """
+        n = len(self)
+        nlist = self.nlist or max(1, int(np.sqrt(n)))
+        rng = np.random.default_rng(self.seed)
+
+        sample_size = min(n, max(self.train_sample, nlist * 40))
+        sample_ids = np.sort(rng.choice(n, size=sample_size, replace=False))
+        sample = vectors[sample_ids] if vectors is not None else self.store.rows(sample_ids)
+        centroids = sample[rng.choice(sample_size, size=nlist, replace=False)].copy()
+
+        for _ in range(self.kmeans_iters):
+            labels = self._nearest_centroids(sample, centroids)
+            order = np.argsort(labels, kind="stable")
+            sorted_labels = labels[order]
+            starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+            sums = np.add.reduceat(sample[order], starts, axis=0)
+            occupied = sorted_labels[starts]
+
+            new_centroids = centroids.copy()
+            new_centroids[occupied] = sums
+            # Re-seed empty clusters with random sample points
+            empty = np.setdiff1d(np.arange(nlist), occupied)
+            if len(empty):
+                new_centroids[empty] = sample[rng.choice(sample_size, size=len(empty), replace=False)]
+            centroids = normalize_rows(new_centroids)
+
+        self.centroids = centroids
+        self.lists = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self._trained_size = n
+        self._assign_to_lists(np.arange(n), vectors)
+
+    @staticmethod
+    def _nearest_centroids(vectors, centroids, batch_size=16_384):
+        """Cluster label of each vector, computed in batches to bound memory"""
+        labels = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), batch_size):
+            block = vectors[start:start + batch_size]
+            labels[start:start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+        return labels
+
+    def _assign_to_lists(self, ids, vectors=None, batch_size=16_384):
+        """
+        Append vector ids to the inverted list of their nearest centroid
+        vectors: float32 rows for ids if at hand, otherwise read back from the store
+        """
+        if len(ids) == 0:
+            return
+        labels = np.empty(len(ids), dtype=np.int64)
+        for start in range(0, len(ids), batch_size):
+            block_ids = ids[start:start + batch_size]
+            block = vectors[start:start + batch_size] if vectors is not None else self.store.rows(block_ids)
+            labels[start:start + batch_size] = self._nearest_centroids(block, self.centroids)
+
+        order = np.argsort(labels, kind="stable")
+        ids, labels = ids[order], labels[order]
+        bounds = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1], True])
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            label = labels[lo]
+            self.lists[label] = np.concatenate([self.lists[label], ids[lo:hi]])
+
+    def candidates(self, query, nprobe=None):
+        """Ids of every vector in the nprobe partitions closest to the query"""
+        if self.is_exact:
+            return np.arange(len(self))
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        probe = top_k_indices(self.centroids @ query, nprobe)
+        return np.concatenate([self.lists[p] for p in probe])
+
+    def search(self, query, k, nprobe=None, threshold=None):
+        """
+        Find the k vectors with the highest cosine similarity to the query
+        Stored vectors are unit-norm, so scoring is a single matrix-vector product
+        (on the compact form for float16/int8 storage, making scores approximate)
+        Returns: (ids, scores) sorted by descending score, all >= threshold if given
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = normalize_rows(query).reshape(-1)
+        if self.is_exact:
+            scores = self.store.scores(query)
+            best = top_k_indices(scores, k, threshold)
+            return best, scores[best]
+
+        ids = self.candidates(query, nprobe)
+        scores = self.store.scores(query, ids)
+        best = top_k_indices(scores, k, threshold)
+        return ids[best], scores[best]
+
+    def search_many(self, queries, k, nprobe=None, threshold=None):
+        """
+        Search several queries at once
+        In exact mode every query is scored with one matrix-matrix product;
+        partitioned search probes different lists per query, so it runs query by query
+        Returns: List of (ids, scores), one per query, as for search()
+        """
+        queries = normalize_rows(queries)
+        if len(self) == 0 or not self.is_exact:
+            return [self.search(query, k, nprobe=nprobe, threshold=threshold) for query in queries]
+
+        results = []
+        for scores in self.store.scores_many(queries):
+            best = top_k_indices(scores, k, threshold)
+            results.append((best, scores[best]))
+        return results
+
+    def stats(self):
+        """Index shape, knobs and memory footprint, for /status"""
+        return {
+            "vectors": len(self),
+            "mode": "exact" if self.is_exact else "ivf",
+            "nlist": 0 if self.is_exact else len(self.centroids),
+            "nprobe": self.nprobe,
+            "exact_threshold": self.exact_threshold,
+            "precision": self.store.precision,
+            "memory_bytes": self.store.memory_bytes()
+        }
+
+
+# Number of set bits in every byte value, for Hamming distances without np.bitwise_count
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class BinaryIndex:
+    """
+    Sign-bit signatures of the embeddings for a coarse Hamming-distance scan.
+
+    Each vector is reduced to one bit per dimension (x > corpus mean) and packed, so a
+    768-dim embedding takes 96 bytes. The Hamming distance between signatures
+    approximates the angle between vectors; a query XORs its signature with
+    every row, counts differing bits, and keeps the closest `shortlist` ids
+    for exact rescoring by the caller.
+    """
+
+    def __init__(self, block_rows=65_536):
+        self.block_rows = block_rows
+        self._codes = RowBuffer()
+        self.center = None
+
+    def __len__(self):
+        return len(self._codes)
+
+    @property
+    def codes(self):
+        """Packed signatures, one row per vector (None while empty)"""
+        return self._codes.array
+
+    def copy(self):
+        """Copy that can be extended without affecting this index (codes are shared, see RowBuffer)"""
+        clone = copy.copy(self)
+        clone._codes = self._codes.copy()
+        return clone
+
+    def signatures(self, vectors):
+        """Packed sign bits of each row, taken relative to the corpus mean"""
+        return np.packbits((np.asarray(vectors) - self.center) > 0, axis=-1)
+
+    def build(self, vectors):
+        # Centering keeps the bits informative when embeddings share a common offset
+        self.center = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+        self._codes = RowBuffer()
+        self._codes.append(self.signatures(vectors))
+
+    def add(self, vectors):
+        if self.codes is None:
+            self.build(vectors)
+            return
+        self._codes.append(self.signatures(vectors))
+
+    def distances(self, query):
+        """Hamming distance from the query signature to every stored signature"""
+        query_code = self.signatures(np.asarray(query).reshape(-1))
+        codes = self.codes
+        bitwise_count = getattr(np, "bitwise_count", None)  # NumPy >= 2.0
+        if bitwise_count is not None and codes.shape[1] % 8 == 0:
+            # Popcount whole 64-bit words instead of single bytes
+            codes = codes.view(np.uint64)
+            query_code = query_code.view(np.uint64)
+
+        out = np.empty(len(self), dtype=np.uint16)
+        for start in range(0, len(self), self.block_rows):
+            diff = np.bitwise_xor(codes[start:start + self.block_rows], query_code)
+            bits = bitwise_count(diff) if bitwise_count is not None else _POPCOUNT[diff]
+            out[start:start + self.block_rows] = bits.sum(axis=1, dtype=np.uint16)
+        return out
+
+    def search(self, query, shortlist):
+        """Ids of the shortlist signatures closest to the query (unordered)"""
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64)
+        distances = self.distances(query)
+        if shortlist >= len(distances):
+            return np.arange(len(distances))
+        return np.argpartition(distances, shortlist - 1)[:shortlist]
+
+    def memory_bytes(self):
+        return self._codes.memory_bytes()
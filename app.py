@@ -4,13 +4,24 @@ QueryFlux - Flask Web Application
 RAG-based PDF Question Answering and Summarization System
 """
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+import math
 import os
+import queue
+import tempfile
 from backend import QueryFluxEngine
-from summarizer import summarize_text
+from embedding_cache import get_embedding_cache
+from ingestion_jobs import job_manager
+from model_registry import model_registry
+from query_cache import AnswerCache, answer_cache, query_embedding_cache, semantic_answer_cache
+from summarizer import DEFAULT_METHOD, SUMMARIZERS
+from summary_service import summary_service
 
 UPLOAD_FOLDER = "data/knowledge_base"
 ALLOWED_EXTENSIONS = {'pdf'}
+MAX_BATCH_QUESTIONS = 256
+MAX_TOP_K = 50
+MAX_SUMMARY_TOP_K = 50
 
 app = Flask(__name__, template_folder="templates", static_folder="static")
 app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
@@ -25,12 +36,35 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def bounded_number(data, name, default, low, high, kind=int):
+    """
+    Numeric request parameter converted with kind and clamped to [low, high]
+    Raises: ValueError with a message for the client if it is not a finite number
+    """
+    value = data.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"⚠️ {name} must be a number")
+    try:
+        number = kind(value)
+    except (ValueError, OverflowError):
+        raise ValueError(f"⚠️ {name} must be a number")
+    if not math.isfinite(number):
+        raise ValueError(f"⚠️ {name} must be a number")
+    return min(max(number, low), high)
+
+
 def init_engine():
-    """Initialize or reinitialize the QueryFlux engine"""
+    """
+    Initialize or reinitialize the QueryFlux engine
+    Reinitializing only resets corpus state; the encoder stays loaded
+    """
     global engine
     # Ensure upload folder exists
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-    engine = QueryFluxEngine(pdf_folder=UPLOAD_FOLDER)
+    if engine is None:
+        engine = QueryFluxEngine(pdf_folder=UPLOAD_FOLDER)
+    else:
+        engine.reset()
     return engine
 
 
@@ -44,10 +78,10 @@ def index():
 def upload():
     """
     Handle PDF file uploads
-    Process uploaded PDFs: extract text, create chunks, generate embeddings
+    Saves the PDFs and queues a background ingestion job (extract text, create
+    chunks, generate embeddings); responds 202 with the job id right away
+    Progress: GET /jobs/<job_id>
     """
-    global engine
-    
     print("\n" + "="*60)
     print("📤 UPLOAD REQUEST RECEIVED")
     print("="*60)
@@ -68,51 +102,46 @@ def upload():
             "message": "⚠️ Only PDF files are allowed"
         }), 400
 
+    staged = []
     try:
         # Create upload folder
         os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-        # Save uploaded files
+        # Save uploaded files under temporary names; the job moves them into
+        # place when it starts, so a running job never sees a partly written PDF
         saved_files = []
         for uploaded_file in valid_files:
             filename = uploaded_file.filename
-            save_path = os.path.join(UPLOAD_FOLDER, filename)
-            uploaded_file.save(save_path)
+            handle, temp_path = tempfile.mkstemp(prefix=".upload-", suffix=".part", dir=UPLOAD_FOLDER)
+            os.close(handle)
+            staged.append((temp_path, os.path.join(UPLOAD_FOLDER, filename)))
+            uploaded_file.save(temp_path)
             saved_files.append(filename)
             print(f"✓ Saved: {filename}")
 
-        # Reinitialize engine for fresh processing
-        print(f"\n🔄 Initializing QueryFlux Engine...")
-        engine = init_engine()
-
-        # Load and process PDFs
-        print(f"\n📖 Processing {len(saved_files)} PDF(s)...")
-        chunks_count = engine.load_and_chunk_pdfs()
-
-        if chunks_count == 0:
-            return jsonify({
-                "success": False,
-                "message": "❌ No valid text chunks created. Check that:\n1. PDFs contain actual text (not scanned images)\n2. PDFs are not password protected\n3. Try uploading a different PDF file"
-            }), 400
-
-        # Generate embeddings
-        print(f"\n🧠 Generating semantic embeddings...")
-        engine.embed_chunks()
-
-        message = f"✅ Successfully processed {len(saved_files)} PDF(s)!\n📊 Created {chunks_count} text chunks and generated embeddings.\n\n💬 You can now ask questions about the document!"
-        
-        print(f"\n{message}")
+        job = job_manager.submit(saved_files, lambda job: run_ingestion(job, staged))
+        print(f"\n📋 Queued ingestion job {job.id} for {len(saved_files)} PDF(s)")
         print("="*60 + "\n")
-        
+
         return jsonify({
             "success": True,
-            "message": message,
-            "chunks": chunks_count,
+            "message": f"⏳ Processing {len(saved_files)} PDF(s) in the background...",
+            "job_id": job.id,
+            "status_url": f"/jobs/{job.id}",
+            "events_url": f"/jobs/{job.id}/events",
             "files": saved_files
-        })
+        }), 202
+
+    except queue.Full:
+        discard_staged(staged)
+        return jsonify({
+            "success": False,
+            "message": "⚠️ Too many uploads are being processed. Please try again shortly."
+        }), 503
 
     except Exception as e:
-        error_msg = f"❌ Error processing PDFs: {str(e)}"
+        discard_staged(staged)
+        error_msg = f"❌ Error saving PDFs: {str(e)}"
         print(f"\n{error_msg}")
         print("="*60 + "\n")
         return jsonify({
@@ -121,6 +150,157 @@ def upload():
         }), 500
 
 
+def discard_staged(staged):
+    """Delete uploads saved under temporary names that were never moved into place"""
+    for temp_path, _ in staged:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def run_ingestion(job, staged=()):
+    """
+    Ingestion job body, run on the job worker thread
+    staged: (temporary path, final path) of the job's uploads, moved into place
+            here so that jobs never read each other's files while they are written
+    Queries keep using the current index until add_documents publishes the new chunks
+    """
+    global engine
+
+    try:
+        for temp_path, final_path in staged:
+            os.replace(temp_path, final_path)
+    except OSError:
+        discard_staged(staged)
+        raise
+
+    if engine is None:
+        print(f"\n🔄 Initializing QueryFlux Engine...")
+        engine = init_engine()
+
+    # Incrementally ingest this job's PDFs: only contents that are not indexed
+    # yet are extracted and embedded (existing chunks/embeddings are kept)
+    print(f"\n📖 Processing {len(job.files)} PDF(s) (job {job.id})...")
+    paths = [os.path.join(UPLOAD_FOLDER, filename) for filename in job.files]
+    new_chunks = engine.add_documents(paths, progress=job.on_progress)
+    snapshot = engine.snapshot
+    chunks_count = len(snapshot.chunks)
+    corpus_changed(snapshot)
+
+    if chunks_count == 0:
+        raise ValueError("❌ No valid text chunks created. Check that:\n1. PDFs contain actual text (not scanned images)\n2. PDFs are not password protected\n3. Try uploading a different PDF file")
+
+    message = f"✅ Successfully processed {len(job.files)} PDF(s)!\n📊 Added {new_chunks} new text chunks ({chunks_count} indexed in total).\n\n💬 You can now ask questions about the document!"
+    print(f"\n{message}")
+    return {
+        "message": message,
+        "chunks": chunks_count,
+        "new_chunks": new_chunks
+    }
+
+
+def corpus_changed(snapshot):
+    """Drop answers cached for older corpora and start summarizing the new one"""
+    answer_cache.discard_versions_before(snapshot.version)
+    semantic_answer_cache.discard_versions_before(snapshot.version)
+    # Precompute corpus/document summaries in the background
+    summary_service.schedule(snapshot)
+
+
+@app.route("/reindex", methods=["POST"])
+def reindex():
+    """
+    Rebuild the whole index from the PDFs in the upload folder as a background job
+    The rebuilt index is validated and swapped in when complete; until then
+    questions are answered from the current one
+    Progress: GET /jobs/<job_id> or /jobs/<job_id>/events
+    """
+    if engine is None:
+        return jsonify({
+            "success": False,
+            "message": "❌ Please upload and process a PDF first"
+        }), 400
+
+    files = sorted(f for f in os.listdir(UPLOAD_FOLDER) if allowed_file(f)) if os.path.isdir(UPLOAD_FOLDER) else []
+    if not files:
+        return jsonify({
+            "success": False,
+            "message": "⚠️ No PDFs to index"
+        }), 400
+
+    try:
+        job = job_manager.submit(files, run_reindex)
+    except queue.Full:
+        return jsonify({
+            "success": False,
+            "message": "⚠️ Too many uploads are being processed. Please try again shortly."
+        }), 503
+
+    print(f"\n📋 Queued reindex job {job.id} for {len(files)} PDF(s)")
+    return jsonify({
+        "success": True,
+        "message": f"⏳ Rebuilding the index from {len(files)} PDF(s) in the background...",
+        "job_id": job.id,
+        "status_url": f"/jobs/{job.id}",
+        "events_url": f"/jobs/{job.id}/events",
+        "files": files
+    }), 202
+
+
+def run_reindex(job):
+    """Reindex job body: build, validate and swap in a new index (see QueryFluxEngine.rebuild)"""
+    paths = [os.path.join(UPLOAD_FOLDER, filename) for filename in job.files]
+    chunks_count = engine.rebuild(paths, progress=job.on_progress)
+    corpus_changed(engine.snapshot)
+    message = f"✅ Index rebuilt from {len(job.files)} PDF(s) with {chunks_count} text chunks."
+    print(f"\n{message}")
+    return {
+        "message": message,
+        "chunks": chunks_count
+    }
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """State and progress of an ingestion job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "message": "⚠️ Unknown job"
+        }), 404
+    return jsonify({"success": True, "job": job.to_dict()})
+
+
+@app.route("/jobs/<job_id>/events", methods=["GET"])
+def job_events(job_id):
+    """
+    Live progress of an ingestion job as Server-Sent Events
+    Events: started, extraction_started, page_extracted, document_chunked,
+    embedding_started, batch_embedded, index_swapped, then done or failed.
+    Each event's data holds its details plus the job's current counters.
+    Reconnecting clients resume after their Last-Event-ID.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "message": "⚠️ Unknown job"
+        }), 404
+
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID", 0))
+    except ValueError:
+        last_event_id = 0
+
+    return Response(
+        stream_with_context(job.stream(last_event_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.route("/ask", methods=["POST"])
 def ask():
     """
@@ -142,24 +322,78 @@ def ask():
             "message": "⚠️ Please enter a question"
         }), 400
 
-    # Check if engine is initialized with PDFs
-    if engine is None or not engine.chunks or engine.embeddings is None:
+    # Check if engine is initialized with PDFs. The whole request reads this one
+    # snapshot, so an ingest finishing meanwhile cannot mix two corpus versions
+    snapshot = engine.snapshot if engine is not None else None
+    if snapshot is None or not snapshot.ready:
         return jsonify({
             "success": False,
             "message": "❌ Please upload and process a PDF first"
         }), 400
 
+    summary_scope = data.get("summary_scope", "corpus")
+    summary_method = data.get("summary_method", DEFAULT_METHOD)
+    if summary_scope not in ("corpus", "query"):
+        return jsonify({
+            "success": False,
+            "message": "⚠️ summary_scope must be 'corpus' or 'query'"
+        }), 400
+    if summary_method not in SUMMARIZERS:
+        return jsonify({
+            "success": False,
+            "message": f"⚠️ Unknown summary method: {summary_method} (choose from {', '.join(sorted(SUMMARIZERS))})"
+        }), 400
+
     try:
-        # Get answer using RAG
-        answer = engine.ask_question(question)
+        top_k = bounded_number(data, "top_k", 3, 1, MAX_TOP_K)
+        threshold = bounded_number(data, "threshold", 0.35, -1.0, 1.0, float)
+        summary_top_k = bounded_number(data, "summary_top_k", 5, 1, MAX_SUMMARY_TOP_K)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+
+    try:
+        # Get answer using RAG, unless this exact question was already answered
+        # against the current corpus version. A direct phrase match needs no
+        # embedding, so the paraphrase cache is only consulted after it misses
+        corpus_version = snapshot.version
+        cache_key = AnswerCache.make_key(question, top_k, threshold, corpus_version)
+        answer = answer_cache.get(cache_key)
+        if answer is not None:
+            print(f"⚡ Answer served from cache (corpus v{corpus_version})")
+        else:
+            answer = engine.direct_answer(question, top_k=top_k, snapshot=snapshot)
+            if answer is None:
+                query_embedding = engine.encode_query(question)
+                retrieved = semantic_answer_cache.lookup(query_embedding, top_k, threshold, corpus_version)
+                if retrieved is not None:
+                    print(f"⚡ Retrieval served from semantic cache (corpus v{corpus_version})")
+                else:
+                    retrieved = engine.retrieve(question, top_k=top_k, threshold=threshold, snapshot=snapshot,
+                                                query_embedding=query_embedding)
+                    semantic_answer_cache.put(query_embedding, top_k, threshold, corpus_version, retrieved)
+                # Cached chunks are highlighted with this question's words
+                answer = engine.format_answer(question, retrieved)
+            answer_cache.put(cache_key, answer)
         
-        # Optional: Generate summary if requested
+        # Optional summary: of the chunks retrieved for this question (cost grows with
+        # summary_top_k only), or of the corpus, precomputed in the background per version
         summary = None
-        if data.get("include_summary"):
-            print(f"\n📄 Generating summary...")
-            summary_text = " ".join(engine.chunks)
-            summary = summarize_text(summary_text, num_sentences=5)
-            print(f"✓ Summary generated")
+        summary_status = None
+        if data.get("include_summary") and summary_scope == "query":
+            summary = engine.summarize_for_query(question, top_k=summary_top_k, snapshot=snapshot)
+            summary_status = "ready"
+        elif data.get("include_summary"):
+            summaries = summary_service.get(corpus_version, summary_method)
+            if summaries is not None:
+                summary = summaries["corpus"]
+                summary_status = "ready"
+            else:
+                summary_service.schedule(snapshot, summary_method)
+                summary_status = "pending"
+                print(f"⏳ Summary for corpus v{corpus_version} ({summary_method}) is still being computed")
 
         print(f"\n✓ Answer retrieved successfully")
         print("="*60 + "\n")
@@ -167,7 +401,8 @@ def ask():
         return jsonify({
             "success": True,
             "answer": answer,
-            "summary": summary
+            "summary": summary,
+            "summary_status": summary_status
         })
 
     except Exception as e:
@@ -180,23 +415,197 @@ def ask():
         }), 500
 
 
+@app.route("/ask/batch", methods=["POST"])
+def ask_batch():
+    """
+    Answer a list of questions in one request
+    Body: {"questions": [...], "top_k": 3, "threshold": 0.35}
+    Questions not in the answer caches and without a direct match are embedded
+    with one batched model call and scored together against the index
+    (see QueryFluxEngine.retrieve_many)
+    Returns: {"success", "corpus_version", "results": [{"question", "answer"}, ...]}
+    """
+    global engine
+
+    data = request.get_json()
+    questions = data.get("questions") if isinstance(data, dict) else None
+    if not isinstance(questions, list) or not questions:
+        return jsonify({
+            "success": False,
+            "message": "⚠️ Please send a non-empty list of questions"
+        }), 400
+    if len(questions) > MAX_BATCH_QUESTIONS:
+        return jsonify({
+            "success": False,
+            "message": f"⚠️ At most {MAX_BATCH_QUESTIONS} questions per batch"
+        }), 400
+    if not all(isinstance(question, str) and question.strip() for question in questions):
+        return jsonify({
+            "success": False,
+            "message": "⚠️ Every question must be a non-empty string"
+        }), 400
+    questions = [question.strip() for question in questions]
+
+    print("\n" + "="*60)
+    print(f"❓ BATCH OF {len(questions)} QUESTIONS")
+    print("="*60)
+
+    snapshot = engine.snapshot if engine is not None else None
+    if snapshot is None or not snapshot.ready:
+        return jsonify({
+            "success": False,
+            "message": "❌ Please upload and process a PDF first"
+        }), 400
+
+    try:
+        top_k = bounded_number(data, "top_k", 3, 1, MAX_TOP_K)
+        threshold = bounded_number(data, "threshold", 0.35, -1.0, 1.0, float)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "message": str(e)
+        }), 400
+
+    try:
+        corpus_version = snapshot.version
+
+        # Same layers as /ask: exact answers, direct matches, then paraphrases,
+        # then the engine. Questions that normalize to the same cache key are answered once
+        cache_keys = [AnswerCache.make_key(question, top_k, threshold, corpus_version) for question in questions]
+        first = {}
+        for i, key in enumerate(cache_keys):
+            first.setdefault(key, i)
+        by_key = {key: answer_cache.get(key) for key in first}
+        missing = [key for key, answer in by_key.items() if answer is None]
+        print(f"⚡ {len(by_key) - len(missing)} answer(s) served from cache (corpus v{corpus_version})")
+
+        for key in missing:
+            by_key[key] = engine.direct_answer(questions[first[key]], top_k=top_k, snapshot=snapshot)
+        unmatched = [key for key in missing if by_key[key] is None]
+
+        if unmatched:
+            embeddings = engine.encode_queries([questions[first[key]] for key in unmatched])
+            retrieved = {}
+            to_retrieve = []
+            for key, embedding in zip(unmatched, embeddings):
+                retrieved[key] = semantic_answer_cache.lookup(embedding, top_k, threshold, corpus_version)
+                if retrieved[key] is None:
+                    to_retrieve.append((key, embedding))
+
+            if to_retrieve:
+                fresh = engine.retrieve_many(
+                    [questions[first[key]] for key, _ in to_retrieve], top_k=top_k, threshold=threshold,
+                    snapshot=snapshot, query_embeddings=[embedding for _, embedding in to_retrieve]
+                )
+                for (key, embedding), result in zip(to_retrieve, fresh):
+                    retrieved[key] = result
+                    semantic_answer_cache.put(embedding, top_k, threshold, corpus_version, result)
+            for key in unmatched:
+                by_key[key] = engine.format_answer(questions[first[key]], retrieved[key])
+        for key in missing:
+            answer_cache.put(key, by_key[key])
+        answers = [by_key[key] for key in cache_keys]
+
+        print(f"\n✓ {len(questions)} answers retrieved successfully")
+        print("="*60 + "\n")
+
+        return jsonify({
+            "success": True,
+            "corpus_version": corpus_version,
+            "results": [
+                {"question": question, "answer": answer}
+                for question, answer in zip(questions, answers)
+            ]
+        })
+
+    except Exception as e:
+        error_msg = f"❌ Error retrieving answers: {str(e)}"
+        print(f"\n{error_msg}")
+        print("="*60 + "\n")
+        return jsonify({
+            "success": False,
+            "message": error_msg
+        }), 500
+
+
+@app.route("/summary", methods=["GET"])
+def summary():
+    """
+    Corpus and per-document summaries for the current corpus version
+    Optional query parameter: method (one of summarizer.SUMMARIZERS)
+    """
+    global engine
+
+    snapshot = engine.snapshot if engine is not None else None
+    if snapshot is None or not snapshot.chunks:
+        return jsonify({
+            "success": False,
+            "message": "❌ Please upload and process a PDF first"
+        }), 400
+
+    method = request.args.get("method", DEFAULT_METHOD)
+    if method not in SUMMARIZERS:
+        return jsonify({
+            "success": False,
+            "message": f"⚠️ Unknown summary method: {method} (choose from {', '.join(sorted(SUMMARIZERS))})"
+        }), 400
+
+    corpus_version = snapshot.version
+    summaries = summary_service.get(corpus_version, method)
+    if summaries is None:
+        summary_service.schedule(snapshot, method)
+        return jsonify({
+            "success": True,
+            "status": "pending",
+            "method": method,
+            "corpus_version": corpus_version
+        }), 202
+
+    return jsonify({
+        "success": True,
+        "status": "ready",
+        "method": method,
+        "corpus_version": corpus_version,
+        "summary": summaries["corpus"],
+        "documents": summaries["documents"]
+    })
+
+
 @app.route("/status", methods=["GET"])
 def status():
     """Get the current status of the engine"""
     global engine
     
-    if engine is None or not engine.chunks:
+    snapshot = engine.snapshot if engine is not None else None
+    if snapshot is None or not snapshot.chunks:
         return jsonify({
             "ready": False,
             "chunks": 0,
+            "models": model_registry.status(),
+            "embedding_cache": get_embedding_cache().stats(),
+            "query_cache": query_embedding_cache.stats(),
+            "answer_cache": answer_cache.stats(),
+            "semantic_cache": semantic_answer_cache.stats(),
+            "summarizer": summary_service.hierarchical.stats(),
+            "jobs": job_manager.stats(),
             "message": "No PDFs loaded"
         })
     
     return jsonify({
         "ready": True,
-        "chunks": len(engine.chunks),
-        "has_embeddings": engine.embeddings is not None,
-        "message": f"Ready with {len(engine.chunks)} chunks"
+        "chunks": len(snapshot.chunks),
+        "documents": len(snapshot.documents),
+        "has_embeddings": snapshot.embeddings is not None,
+        "index": engine.index_stats(snapshot),
+        "models": model_registry.status(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "query_cache": query_embedding_cache.stats(),
+        "answer_cache": answer_cache.stats(),
+        "semantic_cache": semantic_answer_cache.stats(),
+        "summarizer": summary_service.hierarchical.stats(),
+        "corpus_version": snapshot.version,
+        "jobs": job_manager.stats(),
+        "message": f"Ready with {len(snapshot.chunks)} chunks"
     })
 
 
@@ -205,6 +614,12 @@ def clear():
     """Clear all loaded PDFs and reset the engine"""
     global engine
     
+    if job_manager.has_active():
+        return jsonify({
+            "success": False,
+            "message": "⚠️ PDFs are still being processed. Try again when the upload has finished."
+        }), 409
+
     try:
         # Delete files from upload folder
         if os.path.exists(UPLOAD_FOLDER):
@@ -213,8 +628,12 @@ def clear():
                 if os.path.isfile(file_path):
                     os.remove(file_path)
         
-        # Reset engine
-        engine = None
+        # Reset corpus state (the loaded encoder is kept for the next upload)
+        if engine is not None:
+            engine.reset()
+        answer_cache.clear()
+        semantic_answer_cache.clear()
+        summary_service.clear()
         
         return jsonify({
             "success": True,
@@ -227,10 +646,11 @@ def clear():
         }), 500
 
 
-# Initialize engine on startup
-init_engine()
-
 if __name__ == "__main__":
+    # Initialize engine on startup (not at import time: summarization worker
+    # processes re-import this module on platforms that spawn them)
+    init_engine()
+
     print("\n" + "="*60)
     print("🚀 QueryFlux - PDF Q&A System")
     print("="*60)
@@ -1,11 +1,41 @@
 # backend.py
+import hashlib
+import itertools
 import os
 import re
-import fitz  # PyMuPDF
-from fuzzywuzzy import fuzz
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+import weakref
+from rapidfuzz import fuzz, process
 import numpy as np
+from ann_index import BinaryIndex, IVFIndex, normalize_rows, top_k_indices
+from lexical_index import PositionalIndex, TrigramIndex
+from embedding_cache import get_embedding_cache
+from index_snapshot import IndexSnapshot
+from model_registry import DEFAULT_MODEL, model_registry
+from pdf_extraction import IncrementalChunker, PDFExtractor, page_count
+from quantization import DiskBackedMatrix, remove_stale_files
+from query_cache import normalize_query, query_embedding_cache
+from summarizer import split_sentences, summarize_sentences
+
+# Full-precision embedding files for compact storage modes
+INDEX_DIR = os.path.join("data", "index")
+
+# Process-wide so versions never repeat, even across engine instances
+_corpus_versions = itertools.count(1)
+
+
+def _report(progress, event, **details):
+    """Send a progress event to the optional ingestion callback"""
+    if progress is not None:
+        progress(event, **details)
+
+
+def _safe_page_count(file_path):
+    try:
+        return page_count(file_path)
+    except Exception:
+        return 0
 
 
 class QueryFluxEngine:
@@ -20,112 +50,582 @@ class QueryFluxEngine:
     5. Returns highlighted answers with source context
     """
     
-    def __init__(self, pdf_folder: str, chunk_size=500, overlap=100):
+    def __init__(self, pdf_folder: str, chunk_size=500, overlap=100, model_name=DEFAULT_MODEL,
+                 use_embedding_cache=True, ann_nprobe=8, ann_exact_threshold=20_000,
+                 fuzzy_candidates=200, fuzzy_time_budget=0.25,
+                 embedding_precision="float32", rescore_candidates=50,
+                 binary_prefilter_threshold=None, binary_shortlist=400,
+                 extraction_workers=None, pages_per_task=32, encode_batch_size=256,
+                 rebuild_batch_size=32, rebuild_duty_cycle=0.5):
         """Initialize the QueryFlux engine with a PDF folder path"""
         self.pdf_folder = pdf_folder
         self.chunk_size = chunk_size
         self.overlap = overlap
-        self.chunks = []
-        self.embeddings = None
-        self.model = SentenceTransformer("all-mpnet-base-v2")
-        print(f"✓ QueryFlux Engine initialized | Model: all-mpnet-base-v2")
+        # Encoder is shared process-wide; only the first engine pays the load cost
+        self.model_name = model_name
+        self.model = model_registry.get(model_name)
+        # Persistent (model, chunk hash) -> vector cache shared with other engines
+        self.embedding_cache = get_embedding_cache() if use_embedding_cache else None
+        # Semantic-stage ANN knobs (see ann_index.IVFIndex)
+        self.ann_nprobe = ann_nprobe
+        self.ann_exact_threshold = ann_exact_threshold
+        # Storage precision of the searchable embedding matrix ("float32", "float16"
+        # or "int8"). Compact modes keep full-precision vectors on disk and rescore
+        # the top rescore_candidates hits with them (0 disables rescoring).
+        self.embedding_precision = embedding_precision
+        self.rescore_candidates = rescore_candidates
+        # Optional coarse tier for very large corpora: from this many chunks on,
+        # a sign-bit Hamming scan shortlists binary_shortlist candidates which are
+        # rescored against the full-precision embeddings (None disables it)
+        self.binary_prefilter_threshold = binary_prefilter_threshold
+        self.binary_shortlist = binary_shortlist
+        # Fuzzy-stage knobs: trigram candidates scored per query, and a time
+        # budget (seconds) after which the best match so far is used
+        self.fuzzy_candidates = fuzzy_candidates
+        self.fuzzy_time_budget = fuzzy_time_budget
+        # PDF text extraction runs in a process pool, split per document and
+        # per page range (extraction_workers=1 keeps it in this process)
+        self.extractor = PDFExtractor(extraction_workers, pages_per_task)
+        # Texts per model.encode call during ingestion (one progress event per batch)
+        self.encode_batch_size = encode_batch_size
+        # rebuild() runs while queries are served: it encodes in smaller batches and
+        # pauses after each one so it only uses this share of the time (1.0 = no pauses)
+        self.rebuild_batch_size = rebuild_batch_size
+        self.rebuild_duty_cycle = rebuild_duty_cycle
+        # Full-precision files of earlier runs that were never deleted
+        stale = remove_stale_files(INDEX_DIR)
+        if stale:
+            print(f"🧹 Removed {stale} stale embedding file(s) from {INDEX_DIR}")
+        # Serializes writers (ingest, removal, reset); queries never take it
+        self._write_lock = threading.RLock()
+        # Replaced snapshots still referenced by in-flight queries
+        self._retired = weakref.WeakSet()
+        self.reset()
+        print(f"✓ QueryFlux Engine initialized | Model: {model_name}")
 
-    def load_and_chunk_pdfs(self):
+    def reset(self):
+        """Drop all corpus state (chunks, embeddings) while keeping the loaded model"""
+        with self._write_lock:
+            # (path, size, mtime) -> content hash, so unchanged files are not re-read
+            self._hash_cache = {}
+            self._publish(self._empty_snapshot())
+
+    def _publish(self, snapshot):
         """
-        Load all PDFs from folder, extract text, and chunk into paragraphs
-        Returns: Number of chunks created
+        Make snapshot the one queries read
+        Every published snapshot gets a new corpus_version, which keys anything
+        derived from the corpus (e.g. cached answers). Replacing the reference
+        is atomic: a query sees either the old or the new snapshot, never a mix
         """
-        self.chunks.clear()
+        previous = getattr(self, "snapshot", None)
+        snapshot.version = next(_corpus_versions)
+        self.snapshot = snapshot
+        if previous is not None:
+            # Freed by reference counting once the last query reading it returns
+            self._retired.add(previous)
+
+    # Views of the current snapshot. Read engine.snapshot once instead when
+    # several of them must belong to the same corpus version
+    @property
+    def corpus_version(self):
+        return self.snapshot.version
+
+    @property
+    def chunks(self):
+        return self.snapshot.chunks
+
+    @property
+    def chunk_sources(self):
+        return self.snapshot.chunk_sources
+
+    @property
+    def documents(self):
+        return self.snapshot.documents
+
+    @property
+    def embeddings(self):
+        return self.snapshot.embeddings
+
+    def _empty_snapshot(self):
+        """Unpublished snapshot with no documents and fresh indexes"""
+        return IndexSnapshot(
+            ann_index=self._new_ann_index(),
+            lexical_index=PositionalIndex(),
+            fuzzy_index=TrigramIndex(),
+            binary_index=BinaryIndex() if self.binary_prefilter_threshold is not None else None
+        )
+
+    def _new_ann_index(self):
+        """Empty ANN index configured from the engine's knobs"""
+        return IVFIndex(
+            nprobe=self.ann_nprobe,
+            exact_threshold=self.ann_exact_threshold,
+            precision=self.embedding_precision
+        )
+
+    def _store_embeddings(self, snapshot, vectors, replace=False):
+        """
+        Add unit-norm float32 embeddings to the semantic index of an unpublished snapshot
+        replace=True rebuilds from vectors, otherwise they are appended.
+        snapshot.embeddings always ends up as the full-precision matrix: shared with
+        the index for float32 storage, memory-mapped from disk for compact modes.
+        Appending to the file leaves the rows mapped by older snapshots intact;
+        replacing writes a new file, so the old one lives as long as its snapshots.
+        While the binary prefilter serves queries the ANN index is never searched:
+        no partitions are trained, and in compact modes it is left empty because
+        shortlists are rescored from the disk-backed matrix instead.
+        """
+        previous = snapshot.embeddings
+        if snapshot.binary_index is not None:
+            if replace:
+                snapshot.binary_index.build(vectors)
+            else:
+                snapshot.binary_index.add(vectors)
+
+        partition = not self._binary_prefilter_active(snapshot)
+        if not self._ann_index_used(snapshot):
+            if len(snapshot.ann_index):
+                snapshot.ann_index = self._new_ann_index()
+        elif replace:
+            snapshot.ann_index.build(vectors, normalized=True, partition=partition)
+        else:
+            snapshot.ann_index.add(vectors, normalized=True, partition=partition)
+
+        if self.embedding_precision == "float32":
+            snapshot.embeddings = snapshot.ann_index.vectors
+        else:
+            if replace or snapshot.full_precision is None:
+                snapshot.full_precision = DiskBackedMatrix(INDEX_DIR)
+            elif snapshot.full_precision.rows != len(previous):
+                # Rows of a draft that was never published follow ours: start a new file
+                snapshot.full_precision = DiskBackedMatrix(INDEX_DIR)
+                snapshot.full_precision.append(np.asarray(previous))
+            snapshot.full_precision.append(vectors)
+            snapshot.embeddings = snapshot.full_precision.array
 
-        # Ensure pdf_folder exists
+    def _binary_prefilter_active(self, snapshot):
+        """True when semantic search shortlists with the binary index instead of the ANN index"""
+        binary_index = snapshot.binary_index
+        return binary_index is not None and len(binary_index) >= self.binary_prefilter_threshold
+
+    def _ann_index_used(self, snapshot):
+        """False when the ANN index holds nothing because no query would read it"""
+        return self.embedding_precision == "float32" or not self._binary_prefilter_active(snapshot)
+
+    def _list_pdf_files(self):
+        """Return the paths of all PDFs in the engine's folder"""
         if not os.path.exists(self.pdf_folder):
             print(f"✗ PDF folder does not exist: {self.pdf_folder}")
-            return 0
-
-        abs_path = os.path.abspath(self.pdf_folder)
-        print(f"\n📂 Loading PDFs from: {abs_path}")
-        
-        files_in_folder = os.listdir(self.pdf_folder)
-        pdf_files = [f for f in files_in_folder if f.endswith(".pdf")]
-        
-        if not pdf_files:
-            print(f"✗ No PDF files found in folder")
-            return 0
-        
-        print(f"📄 Found {len(pdf_files)} PDF file(s): {pdf_files}\n")
-
-        for filename in pdf_files:
-            file_path = os.path.join(self.pdf_folder, filename)
-            print(f"  Processing: {filename}")
-            
+            return []
+        return [
+            os.path.join(self.pdf_folder, f)
+            for f in os.listdir(self.pdf_folder)
+            if f.endswith(".pdf")
+        ]
+
+    def _file_hash(self, file_path):
+        """SHA-256 of the file contents, cached by (path, size, mtime)"""
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+        digest = self._hash_cache.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(file_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(block)
+            digest = sha.hexdigest()
+            self._hash_cache[key] = digest
+        return digest
+
+    def _chunk_pages(self, file_path, pages, progress=None):
+        """
+        Split the streamed pages of one PDF into paragraph chunks
+        pages: iterable of (page number, page count, page text); a text that is an
+               exception means the document could not be read
+        Returns: List of chunks (empty if the PDF has no extractable text)
+        """
+        chunks = self._chunk_page_stream(file_path, pages, progress)
+        _report(progress, "document_chunked", file=os.path.basename(file_path), chunks=len(chunks))
+        return chunks
+
+    def _chunk_page_stream(self, file_path, pages, progress):
+        filename = os.path.basename(file_path)
+        print(f"  Processing: {filename}")
+
+        # Only the unfinished paragraph is carried from one page to the next
+        chunker = IncrementalChunker()
+        chunks = []
+        pages_total = 0
+        for page_num, pages_total, page_text in pages:
+            if isinstance(page_text, Exception):
+                print(f"    ✗ Error: {str(page_text)}")
+                return []
+            chunks.extend(chunker.feed(page_text))
+            print(f"    Page {page_num + 1}/{pages_total}: {len(page_text)} chars")
+            _report(progress, "page_extracted", file=filename, page=page_num + 1, pages=pages_total)
+        chunks.extend(chunker.finish())
+
+        print(f"    Total extracted: {chunker.chars} characters")
+        if chunker.pieces == 0:
+            print(f"    ✗ No text extracted (PDF might be scanned/image-based)")
+            return []
+
+        print(f"    ✓ Extracted from {pages_total} pages")
+        print(f"    Found {chunker.pieces} potential chunks (before filtering)")
+        print(f"    ✓ Created {len(chunks)} chunks (filtered from {chunker.pieces})")
+        if chunker.short:
+            print(f"    (Filtered out {chunker.short} short chunks)")
+        return chunks
+
+    def _chunk_documents(self, file_paths, progress=None):
+        """
+        Extract and chunk several PDFs from one page stream (see PDFExtractor.iter_pages)
+        Returns: List of chunk lists, aligned with file_paths
+        """
+        groups = itertools.groupby(self.extractor.iter_pages(file_paths), key=lambda item: item[0])
+        group = next(groups, None)
+        results = []
+        for doc_index, file_path in enumerate(file_paths):
+            if group is not None and group[0] == doc_index:
+                results.append(self._chunk_pages(file_path, (item[1:] for item in group[1]), progress))
+                group = next(groups, None)
+            else:
+                # Documents without pages produce no items in the stream
+                results.append(self._chunk_pages(file_path, (), progress))
+        return results
+
+    def _collect_new_documents(self, file_paths, indexed, progress=None):
+        """
+        Hash every file, then extract those whose contents are not in indexed
+        (a documents table) yet
+        Extraction of all new files runs in one batch on the process pool
+        Returns: (new documents, replaced) - (content_hash, file_path, chunks) for
+                 the new documents in input order, and the content hashes of
+                 indexed documents whose file now has different contents
+        """
+        to_extract = []
+        seen = set()
+        replaced = set()
+
+        for file_path in file_paths:
+            filename = os.path.basename(file_path)
             try:
-                doc = fitz.open(file_path)
-                text = ""
-                page_count = len(doc)
-
-                for page_num in range(page_count):
-                    page = doc[page_num]
-                    page_text = page.get_text()
-                    text += page_text
-                    print(f"    Page {page_num + 1}/{page_count}: {len(page_text)} chars")
-
-                text = text.strip()
-                print(f"    Total extracted: {len(text)} characters")
-                
-                if not text:
-                    print(f"    ✗ No text extracted (PDF might be scanned/image-based)")
-                    doc.close()
-                    continue
-
-                print(f"    ✓ Extracted from {page_count} pages")
-
-                # Smart paragraph/sentence splitting
-                # Split by double newlines or sentence endings
-                paragraphs = re.split(r"\n\s*\n|(?<=[.!?])\s+", text)
-                print(f"    Found {len(paragraphs)} potential chunks (before filtering)")
-                
-                chunk_count = 0
-                short_chunks = []
-                
-                for para in paragraphs:
-                    para = para.strip()
-                    # Keep chunks with more than 20 chars (lowered from 50)
-                    if len(para) > 20:
-                        self.chunks.append(para)
-                        chunk_count += 1
-                    elif len(para) > 0:
-                        short_chunks.append(len(para))
-                
-                print(f"    ✓ Created {chunk_count} chunks (filtered from {len(paragraphs)})")
-                if short_chunks:
-                    print(f"    (Filtered out {len(short_chunks)} short chunks)")
-                
-                doc.close()
-                
-            except Exception as e:
-                print(f"    ✗ Error: {str(e)}")
-                try:
-                    doc.close()
-                except:
-                    pass
+                digest = self._file_hash(file_path)
+            except OSError as e:
+                print(f"  ✗ Cannot read {filename}: {str(e)}")
+                continue
+
+            if digest in indexed or digest in seen:
+                print(f"  ↷ Skipping {filename} (already indexed)")
                 continue
+            seen.add(digest)
 
-        total = len(self.chunks)
+            # Same file name with new contents: the stale version is dropped
+            for old_digest, info in indexed.items():
+                if info["path"] == os.path.abspath(file_path):
+                    print(f"  ♻ {filename} changed on disk, replacing old version")
+                    replaced.add(old_digest)
+
+            to_extract.append((digest, file_path))
+
+        if not to_extract:
+            return [], replaced
+
+        if progress is not None:
+            _report(progress, "extraction_started", files=len(to_extract),
+                    pages=sum(_safe_page_count(file_path) for _, file_path in to_extract))
+
+        start = time.perf_counter()
+        extracted = self._chunk_documents([file_path for _, file_path in to_extract], progress)
+        elapsed = time.perf_counter() - start
+        print(f"  ⚡ Extracted {len(to_extract)} file(s) in {elapsed:.2f}s "
+              f"({self.extractor.max_workers} worker(s))")
+
+        new_documents = [
+            (digest, file_path, chunks)
+            for (digest, file_path), chunks in zip(to_extract, extracted)
+        ]
+        return new_documents, replaced
+
+    @staticmethod
+    def _register_documents(snapshot, new_documents):
+        """Append the chunks of freshly extracted documents to an unpublished snapshot"""
+        for digest, file_path, chunks in new_documents:
+            snapshot.documents[digest] = {
+                "filename": os.path.basename(file_path),
+                "path": os.path.abspath(file_path),
+                "chunks": len(chunks)
+            }
+            snapshot.chunks.extend(chunks)
+            snapshot.chunk_sources.extend([digest] * len(chunks))
+            snapshot.lexical_index.add(chunks)
+            snapshot.fuzzy_index.add(chunks)
+
+    def load_and_chunk_pdfs(self, progress=None):
+        """
+        Load all PDFs from folder, extract text, and chunk into paragraphs
+        Rebuilds the corpus from scratch (see add_documents for incremental ingestion);
+        the new chunks are published without embeddings until embed_chunks() runs
+        progress: Optional progress callback, as for add_documents ("extraction_started",
+                  "page_extracted" and "document_chunked" events)
+        Returns: Number of chunks created
+        """
+        with self._write_lock:
+            abs_path = os.path.abspath(self.pdf_folder)
+            pdf_files = self._list_pdf_files()
+            if not pdf_files:
+                print(f"✗ No PDF files found in folder")
+                self.reset()
+                return 0
+
+            print(f"\n📂 Loading PDFs from: {abs_path}")
+            print(f"📄 Found {len(pdf_files)} PDF file(s): {[os.path.basename(p) for p in pdf_files]}\n")
+
+            snapshot = self._empty_snapshot()
+            new_documents, _ = self._collect_new_documents(pdf_files, indexed={}, progress=progress)
+            self._register_documents(snapshot, new_documents)
+            self._publish(snapshot)
+
+        total = len(snapshot.chunks)
         print(f"\n✓ Total chunks created: {total}")
         if total > 0:
-            print(f"  Average chunk size: {len(' '.join(self.chunks)) // total} chars")
+            print(f"  Average chunk size: {len(' '.join(snapshot.chunks)) // total} chars")
         return total
 
-    def embed_chunks(self):
+    def _encode(self, texts, progress=None, batch_size=None, duty_cycle=1.0):
+        """
+        Encode a list of texts with the shared model
+        Cached embeddings are reused; only cache misses are sent to the model,
+        in batches of batch_size (default encode_batch_size, reported as
+        "batch_embedded" progress events). With duty_cycle < 1, each batch is
+        followed by a pause so encoding takes only that share of the wall time
+        and leaves the CPU (and the model) to concurrent queries
+        """
+        batch_size = batch_size or self.encode_batch_size
+        if self.embedding_cache is None:
+            vectors = [None] * len(texts)
+            missing = list(range(len(texts)))
+        else:
+            vectors = self.embedding_cache.get_many(self.model_name, texts)
+            missing = [i for i, vector in enumerate(vectors) if vector is None]
+        _report(progress, "batch_embedded", done=len(texts) - len(missing), total=len(texts))
+
+        if missing:
+            # Identical texts inside one batch are only encoded once
+            unique_texts = list(dict.fromkeys(texts[i] for i in missing))
+            by_text = {}
+            for start in range(0, len(unique_texts), batch_size):
+                batch = unique_texts[start:start + batch_size]
+                batch_start = time.perf_counter()
+                encoded = self.model.encode(batch, show_progress_bar=False)
+                if duty_cycle < 1:
+                    time.sleep((time.perf_counter() - batch_start) * (1 - duty_cycle) / duty_cycle)
+                if self.embedding_cache is not None:
+                    self.embedding_cache.put_many(self.model_name, batch, encoded)
+                by_text.update(zip(batch, encoded))
+                encoded_share = (start + len(batch)) / len(unique_texts)
+                _report(progress, "batch_embedded", done=len(texts) - len(missing) + round(len(missing) * encoded_share),
+                        total=len(texts))
+            for i in missing:
+                vectors[i] = by_text[texts[i]]
+
+        print(f"  Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
+        return np.vstack(vectors).astype(np.float32, copy=False)
+
+    def embed_chunks(self, progress=None):
         """
         Generate semantic embeddings for all chunks using sentence transformers
+        progress: Optional progress callback, as for add_documents ("embedding_started",
+                  "batch_embedded" and "index_swapped" events)
         """
-        if not self.chunks:
-            raise ValueError("No chunks available. Load and chunk PDFs first.")
+        with self._write_lock:
+            if not self.chunks:
+                raise ValueError("No chunks available. Load and chunk PDFs first.")
 
-        print(f"\n🧠 Generating embeddings for {len(self.chunks)} chunks...")
-        self.embeddings = self.model.encode(self.chunks, show_progress_bar=False)
-        print(f"✓ Embeddings generated | Shape: {self.embeddings.shape}")
+            snapshot = self.snapshot.copy()
+            print(f"\n🧠 Generating embeddings for {len(snapshot.chunks)} chunks...")
+            _report(progress, "embedding_started", chunks=len(snapshot.chunks))
+            # Stored once as unit-norm float32 so queries never recompute row norms
+            self._store_embeddings(snapshot, normalize_rows(self._encode(snapshot.chunks, progress)), replace=True)
+            self._publish(snapshot)
+        print(f"✓ Embeddings generated | Shape: {snapshot.embeddings.shape} | Index: {self.index_stats(snapshot)['mode']}")
+        _report(progress, "index_swapped", chunks=len(snapshot.chunks), new_chunks=len(snapshot.chunks),
+                version=snapshot.version)
+
+    def add_documents(self, file_paths=None, progress=None):
+        """
+        Incrementally ingest PDFs: only files whose contents are not indexed yet
+        are extracted and embedded, and their chunks are appended to the index.
+
+        Args:
+            file_paths: PDFs to ingest (defaults to every PDF in the engine's folder)
+            progress: Optional callback progress(event, **details), called with
+                "extraction_started" (files, pages), "page_extracted" (file, page, pages),
+                "document_chunked" (file, chunks), "embedding_started" (chunks),
+                "batch_embedded" (done, total) and "index_swapped" (chunks, new_chunks, version)
+
+        Queries keep reading the current snapshot while this runs; the new
+        one is built next to it and published when complete.
+
+        Returns: Number of new chunks added
+        """
+        if file_paths is None:
+            file_paths = self._list_pdf_files()
+
+        with self._write_lock:
+            print(f"\n📥 Ingesting {len(file_paths)} PDF file(s) incrementally...")
+            current = self.snapshot
+            new_documents, replaced = self._collect_new_documents(file_paths, current.documents, progress)
+            if not new_documents:
+                print(f"✓ No new documents to index (total: {len(current.chunks)})")
+                _report(progress, "index_swapped", chunks=len(current.chunks), new_chunks=0, version=current.version)
+                return 0
+
+            new_chunks = [chunk for _, _, chunks in new_documents for chunk in chunks]
+            if new_chunks:
+                print(f"\n🧠 Generating embeddings for {len(new_chunks)} new chunks...")
+                _report(progress, "embedding_started", chunks=len(new_chunks))
+                new_embeddings = normalize_rows(self._encode(new_chunks, progress))
+
+            # Everything slow happens above. Text-less documents are recorded
+            # too, so they are not re-extracted
+            if replaced:
+                snapshot, _ = self._without_documents(current, replaced)
+            else:
+                snapshot = current.copy()
+            self._register_documents(snapshot, new_documents)
+            if new_chunks:
+                self._store_embeddings(snapshot, new_embeddings)
+            self._publish(snapshot)
+
+        shape = snapshot.embeddings.shape if snapshot.embeddings is not None else None
+        print(f"✓ Added {len(new_chunks)} chunks | Total: {len(snapshot.chunks)} | Shape: {shape}")
+        _report(progress, "index_swapped", chunks=len(snapshot.chunks), new_chunks=len(new_chunks), version=snapshot.version)
+        return len(new_chunks)
+
+    def rebuild(self, file_paths=None, progress=None):
+        """
+        Re-ingest PDFs from scratch and swap the result in (double-buffered)
+
+        The new index is built next to the serving one, from a fresh extraction
+        and embedding pass (cached embeddings are reused), then validated and
+        published with one reference swap. Encoding is throttled (rebuild_batch_size,
+        rebuild_duty_cycle) to leave CPU to queries. Until then every query is answered
+        from the current snapshot, which is released once the last query (or
+        running background summary) still reading it returns; queued summaries
+        of it are cancelled (see SummaryService). /status reports the replaced
+        snapshots that are not released yet. If the build or the validation
+        fails, the current snapshot stays in place.
+
+        Args:
+            file_paths: PDFs to index (defaults to every PDF in the engine's folder)
+            progress: Optional progress callback, as for add_documents, plus
+                "index_validated" (chunks)
+
+        Returns: Number of chunks in the new index
+        """
+        if file_paths is None:
+            file_paths = self._list_pdf_files()
+
+        with self._write_lock:
+            print(f"\n🔁 Rebuilding the index from {len(file_paths)} PDF file(s)...")
+            snapshot = self._empty_snapshot()
+            new_documents, _ = self._collect_new_documents(file_paths, {}, progress)
+            self._register_documents(snapshot, new_documents)
+            if snapshot.chunks:
+                print(f"\n🧠 Generating embeddings for {len(snapshot.chunks)} chunks...")
+                _report(progress, "embedding_started", chunks=len(snapshot.chunks))
+                vectors = normalize_rows(self._encode(snapshot.chunks, progress, self.rebuild_batch_size,
+                                                      self.rebuild_duty_cycle))
+                self._store_embeddings(snapshot, vectors, replace=True)
+
+            self._validate(snapshot)
+            _report(progress, "index_validated", chunks=len(snapshot.chunks))
+
+            self._publish(snapshot)
+
+        print(f"✓ Index rebuilt | Chunks: {len(snapshot.chunks)} | Corpus v{snapshot.version}")
+        _report(progress, "index_swapped", chunks=len(snapshot.chunks), new_chunks=len(snapshot.chunks),
+                version=snapshot.version)
+        return len(snapshot.chunks)
+
+    def _validate(self, snapshot, samples=8):
+        """
+        Check a rebuilt snapshot before it is published
+        Every index must cover exactly the snapshot's chunks, and a few sampled
+        chunks must retrieve themselves through the semantic search path
+        Raises: ValueError describing the first problem found
+        """
+        count = len(snapshot.chunks)
+        if count == 0:
+            raise ValueError("Rebuilt index is empty: no text could be extracted from the PDFs")
+
+        sizes = {
+            "chunk sources": len(snapshot.chunk_sources),
+            "positional index": len(snapshot.lexical_index),
+            "trigram index": len(snapshot.fuzzy_index),
+            "embeddings": 0 if snapshot.embeddings is None else snapshot.embeddings.shape[0]
+        }
+        if self._ann_index_used(snapshot):
+            sizes["ANN index"] = len(snapshot.ann_index)
+        if snapshot.binary_index is not None:
+            sizes["binary index"] = len(snapshot.binary_index)
+        mismatched = {name: size for name, size in sizes.items() if size != count}
+        if mismatched:
+            raise ValueError(f"Rebuilt index is inconsistent: {count} chunks but {mismatched}")
+
+        rows = np.unique(np.linspace(0, count - 1, min(samples, count)).astype(np.int64))
+        vectors = np.asarray(snapshot.embeddings[rows])
+        if not np.isfinite(vectors).all():
+            raise ValueError("Rebuilt index has non-finite embeddings")
+        for row, vector in zip(rows, vectors):
+            # Another chunk may be an exact duplicate, so the score is checked, not the id
+            _, scores = self._semantic_search(snapshot, vector, 1, None)
+            if len(scores) == 0 or scores[0] < 0.9:
+                raise ValueError(f"Rebuilt index does not retrieve chunk {row} from its own embedding")
+
+    def remove_document(self, document):
+        """
+        Remove a document and its chunks/embeddings from the index
+
+        Args:
+            document: Content hash or file name of an indexed PDF
+
+        Returns: Number of chunks removed
+        """
+        with self._write_lock:
+            current = self.snapshot
+            digest = document if document in current.documents else None
+            if digest is None:
+                for candidate, info in current.documents.items():
+                    if info["filename"] == document:
+                        digest = candidate
+                        break
+            if digest is None:
+                raise ValueError(f"Document not indexed: {document}")
+
+            snapshot, removed = self._without_documents(current, {digest})
+            self._publish(snapshot)
+
+        print(f"🗑️ Removed {current.documents[digest]['filename']} ({removed} chunks) | Total: {len(snapshot.chunks)}")
+        return removed
+
+    def _without_documents(self, snapshot, digests):
+        """
+        Unpublished copy of snapshot without the given documents
+        Chunk ids shift after a removal, so every index is rebuilt
+        Returns: (new snapshot, number of chunks removed)
+        """
+        keep = [i for i, source in enumerate(snapshot.chunk_sources) if source not in digests]
+        draft = self._empty_snapshot()
+        draft.documents = {digest: info for digest, info in snapshot.documents.items() if digest not in digests}
+        draft.chunks = [snapshot.chunks[i] for i in keep]
+        draft.chunk_sources = [snapshot.chunk_sources[i] for i in keep]
+        draft.lexical_index.add(draft.chunks)
+        draft.fuzzy_index.add(draft.chunks)
+        if snapshot.embeddings is not None and keep:
+            self._store_embeddings(draft, np.asarray(snapshot.embeddings[keep]), replace=True)
+        return draft, len(snapshot.chunks) - len(keep)
 
     @staticmethod
     def highlight_keywords(text, keywords):
@@ -135,64 +635,294 @@ class QueryFluxEngine:
             text = pattern.sub(lambda m: f"<mark>{m.group(0)}</mark>", text)
         return text
 
-    def ask_question(self, query, top_k=3, threshold=0.35):
+    def _fuzzy_search(self, snapshot, query_lower, batch_size=64):
+        """
+        Best partial_ratio match among trigram candidates
+        Returns: (chunk, score), or ("", 0) if no chunk shares a trigram with the query
+        """
+        deadline = time.perf_counter() + self.fuzzy_time_budget
+        candidate_ids = snapshot.fuzzy_index.candidates(query_lower, limit=self.fuzzy_candidates)
+
+        best_match = ""
+        best_score = 0
+        for start in range(0, len(candidate_ids), batch_size):
+            batch = candidate_ids[start:start + batch_size]
+            texts = [snapshot.chunks[i].lower() for i in batch]
+            scores = process.cdist([query_lower], texts, scorer=fuzz.partial_ratio)[0]
+            best = int(scores.argmax())
+            if scores[best] > best_score:
+                best_score = float(scores[best])
+                best_match = snapshot.chunks[batch[best]]
+            if time.perf_counter() > deadline:
+                print(f"  ⏱ Fuzzy time budget reached after {start + len(batch)} candidates")
+                break
+
+        return best_match, best_score
+
+    def encode_query(self, query):
+        """Embedding of a question, served from the process-wide query cache when possible"""
+        return query_embedding_cache.get_or_encode(
+            self.model_name, query, lambda text: self.model.encode([text])[0]
+        )
+
+    def encode_queries(self, queries):
+        """
+        Embeddings of several questions, in order
+        Cache misses are encoded together in one batched model call
+        """
+        return query_embedding_cache.get_or_encode_many(
+            self.model_name, queries, lambda texts: self.model.encode(texts, show_progress_bar=False)
+        )
+
+    def _semantic_search(self, snapshot, query_embedding, top_k, threshold):
+        """
+        Top-k chunks by cosine similarity, all >= threshold
+        With compact storage, the top rescore_candidates hits from the index are
+        rescored exactly against the full-precision vectors. Above
+        binary_prefilter_threshold chunks, the shortlist comes from the binary
+        Hamming scan instead of the ANN index
+        Returns: (chunk ids, scores) sorted by descending score
+        """
+        query = normalize_rows(query_embedding).reshape(-1)
+
+        if self._binary_prefilter_active(snapshot):
+            candidate_ids = snapshot.binary_index.search(query, self.binary_shortlist)
+            return self._rescore(snapshot, query, candidate_ids, top_k, threshold)
+
+        if snapshot.full_precision is None or not self.rescore_candidates:
+            return snapshot.ann_index.search(query, top_k, threshold=threshold)
+
+        candidate_ids, _ = snapshot.ann_index.search(query, max(top_k, self.rescore_candidates))
+        return self._rescore(snapshot, query, candidate_ids, top_k, threshold)
+
+    def _semantic_search_many(self, snapshot, query_embeddings, top_k, threshold):
+        """
+        _semantic_search for a matrix of query embeddings
+        Plain index searches score all queries with one matrix-matrix product;
+        binary-prefiltered and rescored searches have per-query candidates
+        Returns: List of (chunk ids, scores), one per query
+        """
+        queries = normalize_rows(query_embeddings)
+        per_query = (
+            self._binary_prefilter_active(snapshot)
+            or (snapshot.full_precision is not None and self.rescore_candidates)
+        )
+        if per_query:
+            return [self._semantic_search(snapshot, query, top_k, threshold) for query in queries]
+        return snapshot.ann_index.search_many(queries, top_k, threshold=threshold)
+
+    def _rescore(self, snapshot, query, candidate_ids, top_k, threshold):
+        """Exact cosine scores of candidates against the full-precision embeddings"""
+        candidate_ids = np.sort(candidate_ids)  # sequential reads from a memory map
+        exact_scores = np.asarray(snapshot.embeddings[candidate_ids]) @ query
+        best = top_k_indices(exact_scores, top_k, threshold)
+        return candidate_ids[best], exact_scores[best]
+
+    def index_stats(self, snapshot=None):
+        """Semantic index layout and embedding memory use, for /status"""
+        snapshot = snapshot or self.snapshot
+        stats = snapshot.ann_index.stats()
+        if self._binary_prefilter_active(snapshot):
+            stats["mode"] = "binary"
+            stats["nlist"] = 0
+            stats["vectors"] = len(snapshot.binary_index)
+        stats["full_precision"] = "disk" if snapshot.full_precision is not None else "memory"
+        stats["rescore_candidates"] = self.rescore_candidates if snapshot.full_precision is not None else 0
+        # Older snapshots not yet released because queries are still reading them
+        stats["retired_snapshots"] = len(self._retired)
+        if snapshot.binary_index is not None:
+            stats["binary_prefilter"] = {
+                "active": self._binary_prefilter_active(snapshot),
+                "threshold": self.binary_prefilter_threshold,
+                "shortlist": self.binary_shortlist,
+                "memory_bytes": snapshot.binary_index.memory_bytes()
+            }
+        return stats
+
+    def summarize_for_query(self, query, top_k=5, num_sentences=3, diversity=0.3, snapshot=None):
+        """
+        Query-focused summary: extractive summary of the top_k chunks closest to
+        the query, with sentences ranked by similarity to the (cached) query embedding
+        Cost depends on top_k, not on corpus size
+        snapshot: corpus to read (default: the current one)
+        """
+        snapshot = snapshot or self.snapshot
+        if not snapshot.ready:
+            raise ValueError("Please upload and process a PDF first.")
+
+        query_embedding = self.encode_query(query)
+        chunk_ids, _ = self._semantic_search(snapshot, query_embedding, top_k, None)
+
+        # Keep document order; single-sentence chunks reuse their stored embedding
+        sentences, vectors, to_encode = [], [], []
+        for chunk_id in np.sort(chunk_ids):
+            chunk_sentences = split_sentences(snapshot.chunks[chunk_id])
+            for sentence in chunk_sentences:
+                sentences.append(sentence)
+                if len(chunk_sentences) == 1:
+                    vectors.append(np.asarray(snapshot.embeddings[chunk_id], dtype=np.float32))
+                else:
+                    vectors.append(None)
+                    to_encode.append(len(sentences) - 1)
+
+        if not sentences:
+            return ""
+        if to_encode:
+            # Encoded directly: these sentences are not chunks, so they must not
+            # fill (and evict from) the persistent chunk embedding cache
+            encoded = self.model.encode([sentences[i] for i in to_encode], show_progress_bar=False)
+            for i, vector in zip(to_encode, encoded):
+                vectors[i] = vector
+
+        return summarize_sentences(
+            sentences, num_sentences, "embedding",
+            vectors=np.vstack(vectors), query=query_embedding, diversity=diversity
+        )
+
+    def ask_question(self, query, top_k=3, threshold=0.35, snapshot=None):
         """
         RAG-based question answering with multi-stage retrieval strategy:
         1. Direct text matching (highest precision)
         2. Semantic similarity search (embedding-based)
         3. Fuzzy matching fallback (handles typos/variations)
+
+        Every stage reads the same snapshot (default: the current one), so the
+        answer never mixes two corpus versions and no lock is taken
         """
-        if self.embeddings is None or not self.chunks:
+        snapshot = snapshot or self.snapshot
+        answer = self.direct_answer(query, top_k, snapshot)
+        if answer is not None:
+            return answer
+        return self.format_answer(query, self.retrieve(query, top_k, threshold, snapshot))
+
+    def direct_answer(self, query, top_k=3, snapshot=None):
+        """
+        Stage 1 only: chunks containing the question as a phrase, highlighted
+        Needs no query embedding, so callers try it before anything that does
+        Returns: The answer, or None without a direct match
+        """
+        snapshot = snapshot or self.snapshot
+        if not snapshot.ready:
             raise ValueError("Please upload and process a PDF first.")
 
-        query_lower = query.lower()
-        
-        # Stage 1: Direct text match (highest confidence)
+        # Answers depend only on the normalized question (see query_cache.AnswerCache)
         print(f"\n🔍 Searching for: '{query}'")
-        direct_matches = []
-        for chunk in self.chunks:
-            if query_lower in chunk.lower():
-                direct_matches.append(chunk)
-                if len(direct_matches) == top_k:
-                    break
+        return self._direct_answer(snapshot, normalize_query(query), top_k)
+
+    def retrieve(self, query, top_k=3, threshold=0.35, snapshot=None, query_embedding=None):
+        """
+        Stages 2 and 3 of ask_question, for a question without a direct match
+        query_embedding: the question's embedding if already at hand
+        Returns: (chunks, highlight) - the retrieved chunks, unhighlighted, and
+                 whether format_answer should highlight them; the result does
+                 not depend on the question's wording beyond retrieval, so it
+                 can be reused for a paraphrase (see query_cache.SemanticAnswerCache)
+        """
+        snapshot = snapshot or self.snapshot
+        if not snapshot.ready:
+            raise ValueError("Please upload and process a PDF first.")
+
+        print(f"  No direct match, using semantic search...")
+        if query_embedding is None:
+            query_embedding = self.encode_query(query)
+        hits = self._semantic_search(snapshot, query_embedding, top_k, threshold)
+        return self._semantic_or_fuzzy(snapshot, normalize_query(query), hits)
+
+    def ask_questions(self, queries, top_k=3, threshold=0.35, snapshot=None, query_embeddings=None):
+        """
+        Answer several questions against one snapshot, with the same stages as ask_question
+
+        Questions without a direct match are embedded with one batched model
+        call (see encode_queries) unless query_embeddings (aligned with queries)
+        are given, and retrieved together (see retrieve_many)
+
+        Returns: List of answers aligned with queries
+        """
+        snapshot = snapshot or self.snapshot
+        if not snapshot.ready:
+            raise ValueError("Please upload and process a PDF first.")
+
+        print(f"\n🔍 Searching for {len(queries)} questions")
+        answers = [self._direct_answer(snapshot, normalize_query(query), top_k) for query in queries]
+        pending = [i for i, answer in enumerate(answers) if answer is None]
+        if not pending:
+            return answers
+
+        embeddings = None if query_embeddings is None else [query_embeddings[i] for i in pending]
+        retrieved = self.retrieve_many([queries[i] for i in pending], top_k, threshold, snapshot, embeddings)
+        for i, result in zip(pending, retrieved):
+            answers[i] = self.format_answer(queries[i], result)
+        return answers
+
+    def retrieve_many(self, queries, top_k=3, threshold=0.35, snapshot=None, query_embeddings=None):
+        """
+        retrieve() for several questions without a direct match
+        Missing embeddings are computed with one batched model call, and the
+        questions are scored together with one matrix-matrix product against
+        the embeddings (exact float32/float16/int8 index; partitioned,
+        rescored or binary-prefiltered search runs per question)
+        Returns: List of (chunks, highlight) aligned with queries
+        """
+        snapshot = snapshot or self.snapshot
+        if not snapshot.ready:
+            raise ValueError("Please upload and process a PDF first.")
+
+        print(f"  {len(queries)} without a direct match, using batched semantic search...")
+        if query_embeddings is None:
+            query_embeddings = self.encode_queries(queries)
+        all_hits = self._semantic_search_many(snapshot, np.vstack(query_embeddings), top_k, threshold)
+        return [
+            self._semantic_or_fuzzy(snapshot, normalize_query(query), hits)
+            for query, hits in zip(queries, all_hits)
+        ]
+
+    def format_answer(self, query, retrieved):
+        """Answer text for the (chunks, highlight) of retrieve(), highlighting the question's words"""
+        chunks, highlight = retrieved
+        if not chunks:
+            return "No relevant answer found. Try rephrasing your question or upload documents with related content."
+        if highlight:
+            keywords = normalize_query(query).split()
+            chunks = [self.highlight_keywords(chunk, keywords) for chunk in chunks]
+        return "\n\n---\n\n".join(chunks)
+
+    def _direct_answer(self, snapshot, query_lower, top_k):
+        """
+        Stage 1: chunks containing the question as a phrase, highlighted
+        Phrase lookup in the positional index instead of scanning every chunk
+        Returns: The answer, or None without a direct match
+        """
+        phrase_matches = snapshot.lexical_index.find_phrase(query_lower, limit=top_k)
+        direct_matches = [snapshot.chunks[chunk_id] for chunk_id, _ in phrase_matches]
 
         if direct_matches:
             print(f"  ✓ Found {len(direct_matches)} direct text matches")
             highlighted = [self.highlight_keywords(chunk, query_lower.split()) for chunk in direct_matches]
             return "\n\n---\n\n".join(highlighted)
+        return None
 
-        # Stage 2: Semantic similarity search
-        print(f"  No direct match, using semantic search...")
-        query_embedding = self.model.encode([query_lower])
-        similarities = cosine_similarity(query_embedding, self.embeddings)[0]
-        top_indices = similarities.argsort()[::-1]
-
-        results = []
-        for idx in top_indices:
-            if similarities[idx] >= threshold:
-                results.append((self.chunks[idx], similarities[idx]))
-            if len(results) == top_k:
-                break
+    def _semantic_or_fuzzy(self, snapshot, query_lower, hits):
+        """
+        Stages 2 and 3: the semantic hits (chunk ids, scores) if there are any,
+        otherwise the best fuzzy match
+        Returns: (chunks, highlight), as for retrieve()
+        """
+        top_indices, similarities = hits
+        results = [(snapshot.chunks[idx], score) for idx, score in zip(top_indices, similarities)]
 
         if results:
             print(f"  ✓ Found {len(results)} semantic matches")
-            chunks_only = [r[0] for r in results]
-            highlighted = [self.highlight_keywords(chunk, query_lower.split()) for chunk in chunks_only]
-            return "\n\n---\n\n".join(highlighted)
+            return tuple(r[0] for r in results), True
 
         # Stage 3: Fuzzy matching fallback (tolerates typos)
+        # Only chunks sharing the most trigrams with the query are scored,
+        # in batches, until the time budget runs out
         print(f"  No semantic match, using fuzzy search...")
-        best_match = ""
-        best_score = 0
-        for chunk in self.chunks:
-            score = fuzz.partial_ratio(query_lower, chunk.lower())
-            if score > best_score:
-                best_score = score
-                best_match = chunk
+        best_match, best_score = self._fuzzy_search(snapshot, query_lower)
 
         if best_score > 50:
-            print(f"  ✓ Fuzzy match found (score: {best_score})")
-            return f"{best_match}"
+            print(f"  ✓ Fuzzy match found (score: {best_score:.0f})")
+            return (best_match,), False
 
         print(f"  ✗ No answer found")
-        return "No relevant answer found. Try rephrasing your question or upload documents with related content."
+        return (), False
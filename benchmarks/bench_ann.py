@@ -0,0 +1,69 @@
+# benchmarks/bench_ann.py
+"""
+ANN Index Benchmark
+Compares exact brute-force search with the IVF index on synthetic embeddings
+Reports per-query latency and recall@k for several nprobe settings
+
+Usage: python benchmarks/bench_ann.py [num_vectors ...]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_index import IVFIndex, normalize_rows, top_k_indices
+
+DIM = 768
+TOP_K = 10
+NUM_QUERIES = 50
+
+
+def synthetic_embeddings(n, dim=DIM, clusters=256, seed=0):
+    """Clustered unit vectors, roughly shaped like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    vectors = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return normalize_rows(vectors)
+
+
+def synthetic_queries(vectors, n=NUM_QUERIES, noise=0.5, seed=1):
+    """Queries near existing vectors, so true nearest neighbours are meaningful"""
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.integers(0, len(vectors), size=n)]
+    dim = vectors.shape[1]
+    return normalize_rows(picks + noise / np.sqrt(dim) * rng.standard_normal((n, dim)).astype(np.float32))
+
+
+def time_queries(search, queries):
+    """Average milliseconds per query"""
+    start = time.perf_counter()
+    results = [search(q) for q in queries]
+    return (time.perf_counter() - start) * 1000 / len(queries), results
+
+
+def run(n):
+    print(f"\n📊 {n:,} vectors x {DIM} dims")
+    vectors = synthetic_embeddings(n)
+    queries = synthetic_queries(vectors)
+
+    exact_ms, exact = time_queries(lambda q: top_k_indices(vectors @ q, TOP_K), queries)
+    print(f"  exact scan        : {exact_ms:8.2f} ms/query")
+
+    index = IVFIndex(exact_threshold=0)
+    start = time.perf_counter()
+    index.build(vectors)
+    print(f"  IVF build         : {time.perf_counter() - start:8.2f} s (nlist={len(index.centroids)})")
+
+    for nprobe in (4, 8, 16, 32):
+        ivf_ms, found = time_queries(lambda q: index.search(q, TOP_K, nprobe=nprobe)[0], queries)
+        recall = np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(exact, found)])
+        print(f"  IVF nprobe={nprobe:<3}    : {ivf_ms:8.2f} ms/query | recall@{TOP_K}: {recall:.3f}")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    for size in sizes:
+        run(size)
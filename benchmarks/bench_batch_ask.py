@@ -0,0 +1,78 @@
+# benchmarks/bench_batch_ask.py
+"""
+Batched Question Micro-Benchmark
+Per-question cost of the two batched steps behind /ask/batch, against one
+call per question:
+- encoding: model.encode([q]) per question vs one model.encode(questions)
+- scoring:  IVFIndex.search per question (matrix-vector) vs search_many
+            (one matrix-matrix product), exact mode, 768-dim embeddings
+
+Usage: python benchmarks/bench_batch_ask.py [num_chunks] [batch_size ...]
+       (default: 20000 chunks, batches of 1 8 32 128; encoding loads the
+       default sentence-transformers model)
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_index import IVFIndex, normalize_rows
+
+DIM = 768
+TOP_K = 3
+THRESHOLD = 0.35
+WORDS = ("data model index query vector page text summary system method "
+         "result analysis research evaluation code retrieval document").split()
+
+
+def per_question_ms(fn, batch_size, repeats=3):
+    """Best-of-repeats wall time of fn(), per question"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000 / batch_size
+
+
+def bench_scoring(num_chunks, batch_sizes):
+    rng = np.random.default_rng(0)
+    index = IVFIndex(exact_threshold=num_chunks + 1)
+    index.build(rng.standard_normal((num_chunks, DIM), dtype=np.float32))
+
+    print(f"\n📊 Scoring: {num_chunks:,} chunks, {DIM}-dim, top-{TOP_K}\n")
+    print(f"  {'batch':>5} | {'per query':>10} | {'batched':>10} | {'speedup':>7} | identical")
+    for batch_size in batch_sizes:
+        queries = normalize_rows(rng.standard_normal((batch_size, DIM), dtype=np.float32))
+        single = [index.search(q, TOP_K, threshold=THRESHOLD) for q in queries]
+        batched = index.search_many(queries, TOP_K, threshold=THRESHOLD)
+        same = all(np.array_equal(a[0], b[0]) for a, b in zip(single, batched))
+
+        loop_ms = per_question_ms(lambda: [index.search(q, TOP_K, threshold=THRESHOLD) for q in queries], batch_size)
+        batch_ms = per_question_ms(lambda: index.search_many(queries, TOP_K, threshold=THRESHOLD), batch_size)
+        print(f"  {batch_size:>5} | {loop_ms:7.3f} ms | {batch_ms:7.3f} ms | {loop_ms / batch_ms:6.1f}x | {same}")
+
+
+def bench_encoding(batch_sizes):
+    from model_registry import model_registry
+
+    model = model_registry.get()
+    rng = np.random.default_rng(0)
+    model.encode(["warm up"], show_progress_bar=False)
+
+    print(f"\n📊 Encoding: {model_registry.status()}\n")
+    print(f"  {'batch':>5} | {'per query':>10} | {'batched':>10} | {'speedup':>7}")
+    for batch_size in batch_sizes:
+        questions = [" ".join(rng.choice(WORDS, size=8)) + "?" for _ in range(batch_size)]
+        loop_ms = per_question_ms(lambda: [model.encode([q], show_progress_bar=False) for q in questions], batch_size, 1)
+        batch_ms = per_question_ms(lambda: model.encode(questions, show_progress_bar=False), batch_size, 1)
+        print(f"  {batch_size:>5} | {loop_ms:7.2f} ms | {batch_ms:7.2f} ms | {loop_ms / batch_ms:6.1f}x")
+
+
+if __name__ == "__main__":
+    num_chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    batch_sizes = [int(arg) for arg in sys.argv[2:]] or [1, 8, 32, 128]
+    bench_scoring(num_chunks, batch_sizes)
+    bench_encoding(batch_sizes)
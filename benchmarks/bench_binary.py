@@ -0,0 +1,45 @@
+# benchmarks/bench_binary.py
+"""
+Binary Prefilter Benchmark
+Sign-bit signatures + Hamming scan, then float32 rescoring of the shortlist
+Reports signature memory, scan latency and recall@k against exact search
+
+Usage: python benchmarks/bench_binary.py [num_chunks]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_index import BinaryIndex, top_k_indices
+from bench_ann import synthetic_embeddings, synthetic_queries
+
+TOP_K = 10
+NUM_QUERIES = 50
+
+
+def run(n):
+    vectors = synthetic_embeddings(n)
+    queries = synthetic_queries(vectors, NUM_QUERIES)
+    exact = [set(top_k_indices(vectors @ q, TOP_K)) for q in queries]
+
+    index = BinaryIndex()
+    index.build(vectors)
+    print(f"\n📊 {n:,} chunks | signatures: {index.memory_bytes() / 1e6:.1f} MB "
+          f"({index.codes.shape[1]} bytes/chunk) vs float32: {vectors.nbytes / 1e6:.1f} MB\n")
+
+    for shortlist in (100, 400, 1000):
+        start = time.perf_counter()
+        found = []
+        for q in queries:
+            candidates = np.sort(index.search(q, shortlist))
+            found.append(set(candidates[top_k_indices(vectors[candidates] @ q, TOP_K)]))
+        ms = (time.perf_counter() - start) * 1000 / NUM_QUERIES
+        recall = np.mean([len(a & b) / TOP_K for a, b in zip(exact, found)])
+        print(f"  shortlist={shortlist:<5} | {ms:7.2f} ms/query | recall@{TOP_K}: {recall:.3f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
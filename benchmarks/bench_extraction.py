@@ -0,0 +1,79 @@
+# benchmarks/bench_extraction.py
+"""
+PDF Extraction Scaling Benchmark
+Generates synthetic PDFs and reports extraction throughput of PDFExtractor
+for 1..N worker processes, and the speedup over a single process
+
+Usage: python benchmarks/bench_extraction.py [num_documents] [pages_per_document]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import fitz  # PyMuPDF
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pdf_extraction import PDFExtractor
+
+WORDS = ("data model index query vector page text summary system method "
+         "result analysis research evaluation code retrieval document").split()
+
+
+def synthetic_pdfs(directory, num_documents, pages, seed=0):
+    """Write num_documents PDFs of the given page count with random prose"""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for d in range(num_documents):
+        doc = fitz.open()
+        for _ in range(pages):
+            lines = [" ".join(rng.choice(WORDS, size=rng.integers(6, 14))) + "." for _ in range(45)]
+            doc.new_page().insert_text((40, 40), "\n".join(lines), fontsize=8)
+        path = os.path.join(directory, f"doc{d:03d}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+
+def worker_counts():
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def run(num_documents, pages):
+    with tempfile.TemporaryDirectory() as directory:
+        paths = synthetic_pdfs(directory, num_documents, pages)
+        total_pages = num_documents * pages
+        print(f"\n📊 {num_documents} PDFs x {pages} pages = {total_pages:,} pages | {os.cpu_count()} CPU cores\n")
+        print(f"  {'workers':>7} | {'time':>8} | {'pages/s':>8} | {'speedup':>7}")
+
+        reference = None
+        baseline = None
+        for workers in worker_counts():
+            extractor = PDFExtractor(max_workers=workers)
+            if workers > 1:
+                extractor.extract(paths[:1])  # start the pool outside the timing
+            start = time.perf_counter()
+            results = extractor.extract(paths)
+            elapsed = time.perf_counter() - start
+            extractor.close()
+
+            # Output must not depend on the number of workers
+            if reference is None:
+                reference = results
+            assert results == reference, "extraction output differs between worker counts"
+
+            baseline = baseline or elapsed
+            print(f"  {workers:>7} | {elapsed:7.2f}s | {total_pages / elapsed:8.0f} | {baseline / elapsed:6.2f}x")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 16,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100)
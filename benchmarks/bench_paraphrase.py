@@ -0,0 +1,75 @@
+# benchmarks/bench_paraphrase.py
+"""
+Paraphrase Distance Benchmark
+Cosine distances between question embeddings of the semantic answer cache:
+pairs asking the same thing in other words (should hit) and pairs asking
+different things about the same topic (must miss), plus the share of each
+within candidate max_distance values
+
+Usage: python benchmarks/bench_paraphrase.py [model_name]
+(loads the default sentence-transformers model unless one is given)
+"""
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_index import normalize_rows
+from model_registry import DEFAULT_MODEL, model_registry
+from query_cache import DEFAULT_PARAPHRASE_DISTANCE
+
+PARAPHRASES = [
+    ("What is the refund policy?", "How do refunds work?"),
+    ("What is the refund policy?", "what's the policy on refunds"),
+    ("How long is the warranty?", "What is the warranty period?"),
+    ("Who is the author of the report?", "Who wrote this report?"),
+    ("When was the company founded?", "In what year was the company established?"),
+    ("What are the system requirements?", "Which hardware and software do I need?"),
+    ("How do I reset my password?", "How can I change a forgotten password?"),
+    ("What is the main conclusion of the study?", "What did the study conclude?"),
+    ("How many employees does the company have?", "What is the company's headcount?"),
+    ("What does the contract say about termination?", "How can the contract be terminated?"),
+    ("What is machine learning?", "Define machine learning"),
+    ("Which datasets were used in the evaluation?", "What data was the evaluation run on?"),
+]
+
+DISTINCT = [
+    ("What is the refund policy?", "How long do refunds take to arrive?"),
+    ("How long is the warranty?", "What does the warranty not cover?"),
+    ("Who is the author of the report?", "Who funded the report?"),
+    ("When was the company founded?", "Where is the company headquartered?"),
+    ("What are the system requirements?", "How do I install the system?"),
+    ("How do I reset my password?", "How do I delete my account?"),
+    ("What is the main conclusion of the study?", "What are the limitations of the study?"),
+    ("How many employees does the company have?", "How much revenue does the company make?"),
+    ("What does the contract say about termination?", "What does the contract say about payment?"),
+    ("What is machine learning?", "What is deep learning?"),
+    ("Which datasets were used in the evaluation?", "Which metrics were used in the evaluation?"),
+]
+
+CANDIDATES = (0.05, 0.08, 0.1, 0.12, 0.15, 0.2)
+
+
+def distances(model, pairs):
+    first = normalize_rows(model.encode([a for a, _ in pairs], show_progress_bar=False))
+    second = normalize_rows(model.encode([b for _, b in pairs], show_progress_bar=False))
+    return 1.0 - np.einsum("ij,ij->i", first, second)
+
+
+def run(model_name):
+    model = model_registry.get(model_name)
+    same = distances(model, PARAPHRASES)
+    different = distances(model, DISTINCT)
+
+    print(f"\n📊 {model_name} | cosine distance, current default max_distance={DEFAULT_PARAPHRASE_DISTANCE}\n")
+    for label, values in (("paraphrases", same), ("distinct", different)):
+        print(f"  {label:<11} | min {values.min():.3f} | median {np.median(values):.3f} | max {values.max():.3f}")
+
+    print(f"\n  {'max_distance':>12} | {'paraphrase hits':>15} | {'false hits':>10}")
+    for max_distance in CANDIDATES:
+        print(f"  {max_distance:>12} | {np.mean(same <= max_distance):15.2f} | {np.mean(different <= max_distance):10.2f}")
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_MODEL)
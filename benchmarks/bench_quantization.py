@@ -0,0 +1,58 @@
+# benchmarks/bench_quantization.py
+"""
+Embedding Storage Precision Benchmark
+Reports, for each storage precision, the RAM used by the embedding matrix and
+recall@k against exact float32 search, with and without float32 rescoring
+
+Usage: python benchmarks/bench_quantization.py [num_chunks]
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_index import top_k_indices
+from bench_ann import synthetic_embeddings, synthetic_queries
+from quantization import PRECISIONS, QuantizedMatrix
+
+TOP_K = 10
+RESCORE_CANDIDATES = 50
+NUM_QUERIES = 50
+
+
+def recall(expected, found):
+    return np.mean([len(set(a) & set(b)) / TOP_K for a, b in zip(expected, found)])
+
+
+def run(n):
+    vectors = synthetic_embeddings(n)
+    queries = synthetic_queries(vectors, NUM_QUERIES)
+    exact = [top_k_indices(vectors @ q, TOP_K) for q in queries]
+    baseline = vectors.nbytes
+
+    print(f"\n📊 {n:,} chunks x {vectors.shape[1]} dims | top-{TOP_K}, rescoring {RESCORE_CANDIDATES} candidates\n")
+    print(f"  {'precision':<9} | {'memory':>10} | {'vs float32':>10} | {'ms/query':>8} | "
+          f"{'recall':>6} | {'recall+rescore':>14}")
+
+    for precision in PRECISIONS:
+        store = QuantizedMatrix(precision)
+        store.set(vectors)
+
+        start = time.perf_counter()
+        approx = [top_k_indices(store.scores(q), TOP_K) for q in queries]
+        ms = (time.perf_counter() - start) * 1000 / NUM_QUERIES
+
+        rescored = []
+        for q in queries:
+            candidates = top_k_indices(store.scores(q), RESCORE_CANDIDATES)
+            rescored.append(candidates[top_k_indices(vectors[candidates] @ q, TOP_K)])
+
+        memory = store.memory_bytes()
+        print(f"  {precision:<9} | {memory / 1e6:8.1f} MB | {baseline / memory:9.1f}x | {ms:8.2f} | "
+              f"{recall(exact, approx):6.3f} | {recall(exact, rescored):14.3f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,79 @@
+# benchmarks/bench_reindex.py
+"""
+Query Latency During Re-Indexing
+Indexes synthetic PDFs, then reports /ask-path latency percentiles of
+QueryFluxEngine.ask_question in steady state and while engine.rebuild()
+builds and swaps in a new index on a background thread
+
+Usage: python benchmarks/bench_reindex.py [num_documents] [pages_per_document] [duty_cycle]
+(loads the default sentence-transformers model; duty_cycle is the engine's
+rebuild_duty_cycle, 1.0 rebuilds without pauses)
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from backend import QueryFluxEngine
+from bench_extraction import synthetic_pdfs
+
+STEADY_SECONDS = 5.0
+
+
+def latencies(engine, questions, until):
+    """Run questions round-robin until until() is true; per-query seconds"""
+    timings = []
+    i = 0
+    while not until():
+        start = time.perf_counter()
+        engine.ask_question(questions[i % len(questions)])
+        timings.append(time.perf_counter() - start)
+        i += 1
+    return np.array(timings)
+
+
+def run(num_documents, pages, duty_cycle=0.5):
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic_pdfs(directory, num_documents, pages)
+        # No embedding cache: the rebuild re-encodes every chunk (worst case)
+        engine = QueryFluxEngine(directory, use_embedding_cache=False, rebuild_duty_cycle=duty_cycle)
+        engine.add_documents()
+        rng = np.random.default_rng(0)
+        questions = [" ".join(engine.chunks[i].split()[:4]) for i in rng.choice(len(engine.chunks), 50)]
+
+        deadline = time.perf_counter() + STEADY_SECONDS
+        steady = latencies(engine, questions, lambda: time.perf_counter() > deadline)
+
+        rebuilt = threading.Event()
+        rebuild_seconds = []
+
+        def rebuild():
+            start = time.perf_counter()
+            engine.rebuild()
+            rebuild_seconds.append(time.perf_counter() - start)
+            rebuilt.set()
+
+        worker = threading.Thread(target=rebuild)
+        worker.start()
+        during = latencies(engine, questions, rebuilt.is_set)
+        worker.join()
+
+        print(f"\n📊 {len(engine.chunks):,} chunks | rebuild took {rebuild_seconds[0]:.2f}s "
+              f"(duty cycle {duty_cycle}) | {os.cpu_count()} CPU cores\n")
+        print(f"  {'phase':<14} | {'queries':>7} | {'p50':>8} | {'p95':>8} | {'p99':>8}")
+        for name, timings in (("steady", steady), ("during rebuild", during)):
+            p50, p95, p99 = np.percentile(timings, [50, 95, 99]) * 1000
+            print(f"  {name:<14} | {len(timings):>7} | {p50:6.2f}ms | {p95:6.2f}ms | {p99:6.2f}ms")
+        ratio = np.percentile(during, 99) / np.percentile(steady, 99)
+        print(f"\n  p99 during rebuild: {ratio:.2f}x steady state")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 0.5)
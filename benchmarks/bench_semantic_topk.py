@@ -0,0 +1,71 @@
+# benchmarks/bench_semantic_topk.py
+"""
+Semantic Top-K Micro-Benchmark
+Per-query cost of the semantic stage before and after pre-normalised embeddings:
+- before: sklearn cosine_similarity (recomputes row norms) + full argsort
+- after:  one matrix-vector product on unit-norm float32 rows + argpartition
+          with vectorised threshold masking
+
+Usage: python benchmarks/bench_semantic_topk.py [num_chunks ...]
+       (default: 10000 100000 1000000; 1M chunks needs ~6 GB RAM)
+"""
+
+import os
+import sys
+import time
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ann_index import normalize_rows, top_k_indices
+
+DIM = 768
+TOP_K = 3
+THRESHOLD = 0.35
+NUM_QUERIES = 20
+
+
+def before(query, embeddings):
+    """Original ask_question stage 2"""
+    similarities = cosine_similarity(query.reshape(1, -1), embeddings)[0]
+    top_indices = similarities.argsort()[::-1]
+    results = []
+    for idx in top_indices:
+        if similarities[idx] >= THRESHOLD:
+            results.append(idx)
+        if len(results) == TOP_K:
+            break
+    return results
+
+
+def after(query, unit_embeddings):
+    """Pre-normalised matrix-vector product + argpartition + threshold mask"""
+    scores = unit_embeddings @ normalize_rows(query)
+    return list(top_k_indices(scores, TOP_K, THRESHOLD))
+
+
+def time_per_query(fn, queries, matrix):
+    start = time.perf_counter()
+    results = [fn(q, matrix) for q in queries]
+    return (time.perf_counter() - start) * 1000 / len(queries), results
+
+
+def run(n):
+    rng = np.random.default_rng(0)
+    raw = rng.standard_normal((n, DIM), dtype=np.float32)
+    queries = [raw[i] + 0.5 * rng.standard_normal(DIM, dtype=np.float32) for i in range(NUM_QUERIES)]
+    unit = normalize_rows(raw)
+
+    before_ms, expected = time_per_query(before, queries, raw)
+    after_ms, actual = time_per_query(after, queries, unit)
+    same = all(list(a) == list(b) for a, b in zip(expected, actual))
+
+    print(f"  {n:>9,} chunks | before: {before_ms:9.2f} ms | after: {after_ms:8.2f} ms | "
+          f"speedup: {before_ms / after_ms:5.1f}x | identical results: {same}")
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000]
+    print(f"\n📊 Semantic top-{TOP_K} (threshold {THRESHOLD}), {DIM}-dim embeddings, {NUM_QUERIES} queries\n")
+    for size in sizes:
+        run(size)
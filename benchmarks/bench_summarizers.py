@@ -0,0 +1,79 @@
+# benchmarks/bench_summarizers.py
+"""
+Summarizer Engine Benchmark
+Reports wall time and peak traced memory of every summarizer engine on a
+synthetic corpus. The embedding engine is fed precomputed vectors, as the web
+app does with the engine's chunk embeddings.
+
+Usage: python benchmarks/bench_summarizers.py [num_sentences]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from summarizer import PAIRWISE_MAX_SENTENCES, SUMMARIZERS, SUMY_MAX_SENTENCES, summarize_text
+
+NUM_SUMMARY_SENTENCES = 5
+VOCABULARY = 20_000
+STOP_WORDS = 100
+EMBEDDING_DIM = 768
+
+
+def synthetic_text(n, seed=0):
+    """
+    n sentences of 8-20 Zipf-distributed content words
+    The head of the distribution is dropped, as stop words would be in real text
+    """
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(8, 21, size=n)
+    words = rng.zipf(1.1, size=int(lengths.sum()))
+    words = words[(words > STOP_WORDS) & (words <= VOCABULARY)]
+    while len(words) < lengths.sum():
+        extra = rng.zipf(1.1, size=int(lengths.sum()))
+        words = np.concatenate([words, extra[(extra > STOP_WORDS) & (extra <= VOCABULARY)]])
+    sentences, start = [], 0
+    for length in lengths:
+        sentences.append(" ".join(f"w{w}" for w in words[start:start + length]))
+        start += length
+    return ". ".join(sentences) + "."
+
+
+def measure(text, method, **options):
+    tracemalloc.start()
+    start = time.perf_counter()
+    summarize_text(text, NUM_SUMMARY_SENTENCES, method=method, fallback=None, **options)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def run(n):
+    text = synthetic_text(n)
+    vectors = np.random.default_rng(1).standard_normal((n, EMBEDDING_DIM)).astype(np.float32)
+
+    cases = [("tfidf", {}), ("tfidf", {"scoring": "pairwise"}), ("lexrank", {}),
+             ("embedding", {"vectors": vectors}), ("embedding", {"vectors": vectors, "diversity": 0.3})]
+    cases += [(name, {}) for name in sorted(SUMMARIZERS) if name.startswith("sumy-")]
+
+    print(f"\n📊 {n:,} sentences | top-{NUM_SUMMARY_SENTENCES} summary\n")
+    print(f"  {'engine':<24} | {'time':>9} | {'peak memory':>11}")
+    for method, options in cases:
+        label = method + (f" ({options['scoring']})" if "scoring" in options else "")
+        label += " + MMR" if "diversity" in options else ""
+        if options.get("scoring") == "pairwise" and n > PAIRWISE_MAX_SENTENCES:
+            print(f"  {label:<24} | skipped: above PAIRWISE_MAX_SENTENCES ({PAIRWISE_MAX_SENTENCES:,})")
+            continue
+        if method.startswith("sumy-") and n > SUMY_MAX_SENTENCES:
+            # Above this size the sumy backends hand the input to the sparse lexrank engine
+            label += " (lexrank)"
+        elapsed, peak = measure(text, method, **options)
+        print(f"  {label:<24} | {elapsed:8.2f}s | {peak / 1e6:8.1f} MB")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
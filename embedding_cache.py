@@ -0,0 +1,171 @@
+# embedding_cache.py
+"""
+Persistent, content-addressed cache of chunk embeddings
+Maps (model name, hash of normalized chunk text) -> embedding vector, stored in SQLite under data/
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.path.join("data", "embedding_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = 200_000  # ~600 MB of float32 768-dim vectors
+
+# SQLite limits the number of bound parameters per statement
+_BATCH = 500
+
+
+def normalize_text(text):
+    """Collapse whitespace so layout-only differences share one cache entry"""
+    return " ".join(text.split())
+
+
+def text_key(text):
+    """Content hash of the normalized chunk text"""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache with least-recently-used eviction.
+
+    Entries are keyed by model name and chunk hash, so switching encoders never
+    returns vectors from a different embedding space. When the cache grows past
+    max_entries, the least recently used entries are deleted.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                key TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                last_used INTEGER NOT NULL,
+                PRIMARY KEY (model, key)
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT MAX(last_used) FROM embeddings").fetchone()
+        self._clock = row[0] or 0
+
+    def _tick(self):
+        self._clock += 1
+        return self._clock
+
+    def get_many(self, model_name, texts):
+        """
+        Look up embeddings for a list of texts
+        Returns: List aligned with texts holding a float32 vector or None for a miss
+        """
+        keys = [text_key(t) for t in texts]
+        found = {}
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), _BATCH):
+                batch = unique_keys[start:start + _BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    [model_name, *batch]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+
+                # Refresh recency of everything we just served
+                hit_keys = [key for key, _ in rows]
+                if hit_keys:
+                    placeholders = ",".join("?" * len(hit_keys))
+                    self._conn.execute(
+                        f"UPDATE embeddings SET last_used = ? WHERE model = ? AND key IN ({placeholders})",
+                        [self._tick(), model_name, *hit_keys]
+                    )
+            self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hits = sum(1 for r in results if r is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def put_many(self, model_name, texts, vectors):
+        """Store embeddings for texts, evicting least recently used entries if over capacity"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        with self._lock:
+            stamp = self._tick()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (model_name, text_key(text), vector.shape[0], vector.tobytes(), stamp)
+                    for text, vector in zip(texts, vectors)
+                ]
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Delete the least recently used entries beyond max_entries"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            print(f"  ♻ Embedding cache evicted {overflow} least recently used entries")
+
+    def clear(self):
+        """Remove every cached embedding and reset the counters"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Hit/miss counters and current size, for /status"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "max_entries": self.max_entries
+        }
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Process-wide cache instance, opened on first use"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_lock:
+            if _shared_cache is None:
+                _shared_cache = EmbeddingCache()
+    return _shared_cache
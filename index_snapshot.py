@@ -0,0 +1,58 @@
+# index_snapshot.py
+"""
+Immutable view of the searchable corpus
+Queries read one IndexSnapshot for their whole run; ingestion builds the next
+snapshot off to the side and publishes it with a single reference swap
+"""
+
+import copy
+
+
+class IndexSnapshot:
+    """
+    One published state of the corpus: the chunks and their source documents,
+    the embedding matrix, the semantic (IVF, binary) and lexical (positional,
+    trigram) indexes, and the corpus version.
+
+    A snapshot is never modified after it has been published. A query reads
+    the engine's current snapshot once and then only uses that object, so it
+    takes no lock and always sees chunks, embeddings and indexes of the same
+    corpus. Writers start from copy(), whose indexes are independent copies,
+    change that draft and publish it by replacing the engine's reference,
+    which is atomic.
+    """
+
+    def __init__(self, ann_index, lexical_index, fuzzy_index, binary_index=None):
+        self.version = 0
+        self.chunks = []
+        # content hash of the source document of each chunk (parallel to chunks)
+        self.chunk_sources = []
+        # content hash -> {"filename", "path", "chunks"} for every indexed PDF
+        self.documents = {}
+        # Full-precision unit-norm matrix, row i belonging to chunk i
+        self.embeddings = None
+        # DiskBackedMatrix the embeddings are mapped from (compact storage modes).
+        # Snapshots that append to it share it; its file is deleted once the
+        # last snapshot using it is gone
+        self.full_precision = None
+        self.ann_index = ann_index
+        self.binary_index = binary_index
+        self.lexical_index = lexical_index
+        self.fuzzy_index = fuzzy_index
+
+    @property
+    def ready(self):
+        """True when there is an embedded corpus to query"""
+        return bool(self.chunks) and self.embeddings is not None
+
+    def copy(self):
+        """Unpublished copy to build the next snapshot from"""
+        draft = copy.copy(self)
+        draft.chunks = list(self.chunks)
+        draft.chunk_sources = list(self.chunk_sources)
+        draft.documents = dict(self.documents)
+        draft.ann_index = self.ann_index.copy()
+        draft.binary_index = self.binary_index.copy() if self.binary_index is not None else None
+        draft.lexical_index = self.lexical_index.copy()
+        draft.fuzzy_index = self.fuzzy_index.copy()
+        return draft
@@ -0,0 +1,228 @@
+# ingestion_jobs.py
+"""
+Background ingestion jobs
+/upload only saves the files and enqueues a job; a worker thread extracts and
+embeds them while queries keep being answered from the current index.
+Progress is available as a snapshot (/jobs/<id>) and as an event stream
+(/jobs/<id>/events, Server-Sent Events)
+"""
+
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+JOB_STATES = ("queued", "extracting", "embedding", "done", "failed")
+
+# Events kept per job for /jobs/<id>/events; clients that fall further behind skip ahead
+MAX_EVENTS = 2_000
+
+
+class IngestionJob:
+    """
+    State and progress of one ingestion run, updated from the engine's
+    add_documents(progress=...) callback and read by /jobs/<id>.
+
+    Every progress event is also appended to a bounded, numbered event log
+    together with the job's counters after the event, so stream readers can
+    wait for and replay events from any position (see events_after).
+    """
+
+    def __init__(self, files):
+        self.id = uuid.uuid4().hex[:12]
+        self.files = list(files)
+        self.state = "queued"
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.pages_total = 0
+        self.pages_done = 0
+        self.chunks_total = 0      # chunks extracted so far / to embed
+        self.chunks_embedded = 0
+        self.result = None
+        self.error = None
+        self._stage_started = None
+        self._events = deque(maxlen=MAX_EVENTS)   # (event id, event, data)
+        self._next_event_id = 1
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def _enter(self, state):
+        self.state = state
+        self._stage_started = time.monotonic()
+
+    def on_progress(self, event, **details):
+        """Progress callback for QueryFluxEngine.add_documents"""
+        with self._lock:
+            if event == "extraction_started":
+                self._enter("extracting")
+                self.pages_total = details["pages"]
+            elif event == "page_extracted":
+                self.pages_done += 1
+            elif event == "document_chunked":
+                self.chunks_total += details["chunks"]
+            elif event == "embedding_started":
+                self._enter("embedding")
+                self.chunks_total = details["chunks"]
+            elif event == "batch_embedded":
+                self.chunks_embedded = details["done"]
+            self._emit(event, details)
+
+    def _emit(self, event, details):
+        """Append an event to the log and wake up waiting readers (lock held)"""
+        data = dict(details, **self._progress())
+        self._events.append((self._next_event_id, event, data))
+        self._next_event_id += 1
+        self._changed.notify_all()
+
+    def start(self):
+        with self._lock:
+            self.started = time.time()
+            self._enter("extracting")
+            self._emit("started", {})
+
+    def finish(self, result=None, error=None):
+        with self._lock:
+            self.finished = time.time()
+            self.result = result
+            self.error = error
+            self.state = "failed" if error is not None else "done"
+            self._emit(self.state, {"result": result, "error": error})
+
+    def eta_seconds(self):
+        """Estimated seconds left in the current stage, from its rate so far"""
+        if self._stage_started is None:
+            return None
+        elapsed = time.monotonic() - self._stage_started
+        if self.state == "extracting" and self.pages_done and self.pages_total:
+            return round(elapsed * (self.pages_total - self.pages_done) / self.pages_done, 1)
+        if self.state == "embedding" and self.chunks_embedded and self.chunks_total:
+            return round(elapsed * (self.chunks_total - self.chunks_embedded) / self.chunks_embedded, 1)
+        return None
+
+    @property
+    def active(self):
+        return self.state not in ("done", "failed")
+
+    def _progress(self):
+        return {
+            "state": self.state,
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "chunks_embedded": self.chunks_embedded,
+            "chunks_total": self.chunks_total,
+            "eta_seconds": self.eta_seconds() if self.active else None
+        }
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "files": self.files,
+                **self._progress(),
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "result": self.result,
+                "error": self.error
+            }
+
+    def events_after(self, last_event_id, timeout=None):
+        """
+        Events newer than last_event_id, waiting up to timeout seconds for one
+        Returns: (events, finished) - events as (event id, event, data) tuples;
+                 finished is True once the job is done and nothing newer is left
+        """
+        with self._lock:
+            self._changed.wait_for(
+                lambda: self._next_event_id - 1 > last_event_id or not self.active,
+                timeout
+            )
+            events = [item for item in self._events if item[0] > last_event_id]
+            return events, not self.active
+
+    def stream(self, last_event_id=0, keepalive_seconds=15):
+        """
+        Server-Sent Events for this job, starting after last_event_id
+        Yields text/event-stream messages until the job has finished; a comment
+        line is sent while idle so proxies keep the connection open
+        """
+        while True:
+            events, finished = self.events_after(last_event_id, keepalive_seconds)
+            for event_id, event, data in events:
+                last_event_id = event_id
+                yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+            if finished:
+                return
+            if not events:
+                yield ": keepalive\n\n"
+
+
+class JobManager:
+    """
+    Bounded queue of ingestion jobs run one at a time by a worker thread.
+
+    Jobs run serially because they all write to the same engine. submit()
+    raises queue.Full when max_queued jobs are already waiting. Finished
+    jobs stay in the job table for /jobs/<id> until max_history newer ones
+    have finished.
+    """
+
+    def __init__(self, max_queued=8, max_history=100):
+        self.max_history = max_history
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, files, run):
+        """
+        Enqueue run(job) for a new job over files
+        Returns: The queued IngestionJob
+        """
+        job = IngestionJob(files)
+        with self._lock:
+            self._queue.put_nowait((job, run))
+            self._jobs[job.id] = job
+            self._prune()
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="ingestion", daemon=True)
+                self._worker.start()
+        return job
+
+    def _work(self):
+        while True:
+            job, run = self._queue.get()
+            job.start()
+            try:
+                job.finish(result=run(job))
+            except Exception as e:
+                print(f"✗ Ingestion job {job.id} failed: {str(e)}")
+                job.finish(error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(finished) - self.max_history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def has_active(self):
+        """True while any job is queued or running"""
+        with self._lock:
+            return any(job.active for job in self._jobs.values())
+
+    def stats(self):
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+        return {state: states.count(state) for state in JOB_STATES}
+
+
+# Ingestion queue of the web app
+job_manager = JobManager()
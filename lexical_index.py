@@ -0,0 +1,199 @@
+# lexical_index.py
+"""
+Lexical indexes built at ingestion time
+- PositionalIndex: inverted index over normalized tokens for exact phrase lookup
+- TrigramIndex: character trigram index that prunes fuzzy matching to a few candidates
+"""
+
+import re
+from array import array
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Lowercased word tokens of text"""
+    return [m.group(0).lower() for m in TOKEN_PATTERN.finditer(text)]
+
+
+def token_spans(text):
+    """(start, end) character offsets of every token in text"""
+    return [m.span() for m in TOKEN_PATTERN.finditer(text)]
+
+
+class PositionalIndex:
+    """
+    Positional inverted index: token -> {chunk_id: [token positions]}.
+
+    Phrase queries intersect the posting lists of their tokens (rarest first)
+    and then check that the tokens occur at consecutive positions, so the cost
+    depends on posting-list sizes rather than on the size of the corpus.
+
+    Copies share posting dicts copy-on-write: add() replaces the dict of a
+    token it extends unless this index created it, so extending a copy costs
+    the postings of the tokens it touches, not the whole index.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.texts = []
+        self._owned = None   # tokens whose posting dicts only this index holds (None: all)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def copy(self):
+        """Copy that can be extended without affecting this index (posting dicts are shared)"""
+        clone = PositionalIndex()
+        clone.texts = list(self.texts)
+        clone.postings = dict(self.postings)
+        clone._owned = set()
+        return clone
+
+    def add(self, texts):
+        """Index new chunks; chunk ids continue from the current size"""
+        batch = {}
+        for text in texts:
+            chunk_id = len(self.texts)
+            self.texts.append(text)
+            for position, token in enumerate(tokenize(text)):
+                batch.setdefault(token, {}).setdefault(chunk_id, []).append(position)
+
+        for token, new_postings in batch.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                self.postings[token] = new_postings
+            elif self._owned is None or token in self._owned:
+                postings.update(new_postings)
+            else:
+                self.postings[token] = {**postings, **new_postings}
+            if self._owned is not None:
+                self._owned.add(token)
+
+    def find_phrase(self, query, limit=None):
+        """
+        Find chunks containing the query tokens as a consecutive phrase
+        Returns: List of (chunk_id, [(start, end), ...]) in chunk order, where each
+                 (start, end) is the character span of one phrase occurrence
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        token_postings = []
+        for token in query_tokens:
+            postings = self.postings.get(token)
+            if not postings:
+                return []
+            token_postings.append(postings)
+
+        # Intersect chunk ids starting from the rarest token
+        by_rarity = sorted(token_postings, key=len)
+        candidate_ids = set(by_rarity[0])
+        for postings in by_rarity[1:]:
+            candidate_ids.intersection_update(postings)
+            if not candidate_ids:
+                return []
+
+        matches = []
+        span = len(query_tokens) - 1
+        for chunk_id in sorted(candidate_ids):
+            position_sets = [set(postings[chunk_id]) for postings in token_postings[1:]]
+            starts = [
+                p for p in token_postings[0][chunk_id]
+                if all(p + i + 1 in positions for i, positions in enumerate(position_sets))
+            ]
+            if not starts:
+                continue
+
+            spans = token_spans(self.texts[chunk_id])
+            offsets = [(spans[p][0], spans[p + span][1]) for p in starts]
+            matches.append((chunk_id, offsets))
+            if limit is not None and len(matches) == limit:
+                break
+
+        return matches
+
+
+def normalize_for_trigrams(text):
+    """Lowercase, collapse whitespace and pad so short strings still yield trigrams"""
+    return f" {' '.join(text.lower().split())} "
+
+
+def trigrams(text):
+    """Set of character trigrams of the normalized text"""
+    text = normalize_for_trigrams(text)
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Character trigram index: trigram -> array of chunk ids containing it.
+
+    Candidate generation counts how many query trigrams each chunk shares,
+    using one vectorised bincount over the relevant posting lists. Trigrams
+    that occur in more than max_df of all chunks carry little signal and are
+    skipped (unless nothing else is left).
+
+    Copies share posting arrays copy-on-write, as in PositionalIndex.
+    """
+
+    def __init__(self, max_df=0.5):
+        self.max_df = max_df
+        self.postings = {}
+        self.size = 0
+        self._owned = None   # trigrams whose arrays only this index holds (None: all)
+
+    def __len__(self):
+        return self.size
+
+    def copy(self):
+        """Copy that can be extended without affecting this index (posting arrays are shared)"""
+        clone = TrigramIndex(self.max_df)
+        clone.postings = dict(self.postings)
+        clone.size = self.size
+        clone._owned = set()
+        return clone
+
+    def add(self, texts):
+        """Index new chunks; chunk ids continue from the current size"""
+        batch = {}
+        for text in texts:
+            chunk_id = self.size
+            self.size += 1
+            for gram in trigrams(text):
+                ids = batch.get(gram)
+                if ids is None:
+                    ids = batch[gram] = array("I")
+                ids.append(chunk_id)
+
+        for gram, new_ids in batch.items():
+            ids = self.postings.get(gram)
+            if ids is None:
+                self.postings[gram] = new_ids
+            elif self._owned is None or gram in self._owned:
+                ids.extend(new_ids)
+            else:
+                self.postings[gram] = ids + new_ids
+            if self._owned is not None:
+                self._owned.add(gram)
+
+    def candidates(self, query, limit=200):
+        """
+        Chunk ids sharing the most trigrams with the query
+        Returns: Array of up to limit chunk ids, best overlap first
+        """
+        lists = [self.postings[g] for g in trigrams(query) if g in self.postings]
+        if not lists or self.size == 0:
+            return np.empty(0, dtype=np.int64)
+
+        selective = [ids for ids in lists if len(ids) <= self.max_df * self.size]
+        lists = selective or lists
+
+        all_ids = np.concatenate([np.frombuffer(ids, dtype=np.uint32) for ids in lists])
+        overlap = np.bincount(all_ids, minlength=self.size)
+        matched = np.flatnonzero(overlap)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-overlap[matched], limit - 1)[:limit]]
+        return matched[np.argsort(-overlap[matched], kind="stable")]
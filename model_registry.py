@@ -0,0 +1,69 @@
+# model_registry.py
+"""
+Process-wide registry of sentence-transformer encoders
+Each model is loaded from disk once and the same instance is shared by every engine
+"""
+
+import threading
+import time
+
+DEFAULT_MODEL = "all-mpnet-base-v2"
+
+
+class ModelRegistry:
+    """
+    Loads each encoder at most once per process and hands out the shared instance.
+
+    A model is "cold" until it has been requested (or warmed) for the first time,
+    and "warm" from then on. Loading is guarded by a lock so concurrent requests
+    for a cold model only trigger a single load.
+    """
+
+    def __init__(self):
+        self._models = {}
+        self._load_seconds = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name=DEFAULT_MODEL):
+        """Return the shared encoder for model_name, loading it on first use"""
+        model = self._models.get(model_name)
+        if model is not None:
+            return model
+
+        with self._lock:
+            model = self._models.get(model_name)
+            if model is None:
+                # Imported here so processes that never encode (spawned extraction and
+                # summarization workers re-import the app) do not load torch
+                from sentence_transformers import SentenceTransformer
+
+                print(f"⏳ Loading encoder: {model_name} (cold start)")
+                start = time.perf_counter()
+                model = SentenceTransformer(model_name)
+                elapsed = time.perf_counter() - start
+                self._models[model_name] = model
+                self._load_seconds[model_name] = elapsed
+                print(f"✓ Encoder ready: {model_name} ({elapsed:.2f}s)")
+        return model
+
+    def warm(self, model_name=DEFAULT_MODEL):
+        """Preload a model so the first request does not pay the load cost"""
+        self.get(model_name)
+
+    def is_warm(self, model_name=DEFAULT_MODEL):
+        """True if the model is already loaded in this process"""
+        return model_name in self._models
+
+    def status(self):
+        """Warm/cold state of the default model and every model loaded by this process"""
+        report = {DEFAULT_MODEL: {"state": "cold", "load_seconds": None}}
+        for name in list(self._models):
+            report[name] = {
+                "state": "warm",
+                "load_seconds": round(self._load_seconds.get(name, 0.0), 3)
+            }
+        return report
+
+
+# Shared by every QueryFluxEngine in this process
+model_registry = ModelRegistry()
@@ -0,0 +1,237 @@
+# pdf_extraction.py
+"""
+PDF text extraction and chunking
+Documents are cut into page ranges that are extracted in a process pool and
+streamed back page by page in input order; an incremental chunker turns the
+page stream into chunks, so neither the whole document text nor its page list
+is ever held in memory, and the output does not depend on the number of workers
+"""
+
+import re
+from collections import deque
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import fitz  # PyMuPDF
+from worker_pool import WorkerPool
+
+# Split by double newlines or sentence endings
+CHUNK_PATTERN = re.compile(r"\n\s*\n|(?<=[.!?])\s+")
+
+# Chunks of this many characters or fewer are dropped
+MIN_CHUNK_CHARS = 20
+
+
+def page_count(path):
+    """Number of pages of the PDF"""
+    with fitz.open(path) as doc:
+        return len(doc)
+
+
+def iter_pages(path, start=0, stop=None):
+    """Yield the text of pages [start, stop) of the PDF, one page at a time"""
+    with fitz.open(path) as doc:
+        for page_num in range(start, len(doc) if stop is None else stop):
+            yield doc[page_num].get_text()
+
+
+def extract_pages(path, start, stop):
+    """Text of pages [start, stop) of the PDF, one string per page"""
+    return list(iter_pages(path, start, stop))
+
+
+def _extract_task(args):
+    """Pool task: (path, start, stop) -> page texts, or the error as a picklable exception"""
+    try:
+        return extract_pages(*args)
+    except Exception as e:
+        return RuntimeError(str(e))
+
+
+class IncrementalChunker:
+    """
+    Splits a stream of text into paragraph/sentence chunks.
+
+    feed() splits the unfinished tail of the previous call plus the new text
+    and returns the chunks that are complete; only the text after the last
+    split point is carried over. The delimiters only ever differ from a split
+    of the concatenated text in how much surrounding whitespace they consume,
+    and chunks are stripped, so the result equals splitting the concatenated
+    text while memory stays bounded by page size.
+    """
+
+    def __init__(self):
+        self.tail = ""
+        self.pieces = 0       # pieces before filtering
+        self.short = 0        # non-empty pieces dropped as too short
+        self.chars = 0        # characters fed
+        self._started = False
+
+    def _keep(self, pieces):
+        chunks = []
+        for para in pieces:
+            para = para.strip()
+            if len(para) > MIN_CHUNK_CHARS:
+                chunks.append(para)
+            elif para:
+                self.short += 1
+        return chunks
+
+    def feed(self, text):
+        """Add text; returns the chunks completed by it"""
+        self.chars += len(text)
+        buffer = self.tail + text
+        if not self._started:
+            # Leading whitespace of the document does not start a piece
+            buffer = buffer.lstrip()
+            self._started = bool(buffer)
+        pieces = CHUNK_PATTERN.split(buffer)
+        self.tail = pieces.pop()
+        self.pieces += len(pieces)
+        return self._keep(pieces)
+
+    def finish(self):
+        """Flush the unfinished tail; returns the last chunks"""
+        tail, self.tail = self.tail.strip(), ""
+        if not tail:
+            return []
+        self.pieces += 1
+        return self._keep([tail])
+
+
+class PDFExtractor:
+    """
+    Extracts the text of many PDFs with a pool of worker processes.
+
+    Every document is cut into ranges of pages_per_task pages, so one large
+    PDF is spread over several workers just like many small ones. Pages are
+    streamed back in input order; at most `lookahead` ranges are in flight or
+    buffered at once, which bounds memory regardless of document size. With
+    max_workers=1, or when there is only a single range, pages are read one
+    at a time in the calling process.
+
+    The pool (see worker_pool.WorkerPool) is started on first use and shut
+    down after a minute without extractions. If a worker dies (e.g. out of
+    memory on a huge PDF), the pool is replaced and the ranges in flight are
+    retried once; a second crash fails only the current extraction.
+
+    Knobs:
+        max_workers: worker processes (default: worker_pool.DEFAULT_MAX_WORKERS)
+        pages_per_task: pages extracted per task
+        lookahead: ranges submitted ahead of the consumer (default: 2 per worker)
+    """
+
+    def __init__(self, max_workers=None, pages_per_task=32, lookahead=None):
+        self.workers = WorkerPool(max_workers)
+        self.max_workers = self.workers.max_workers
+        self.pages_per_task = pages_per_task
+        self.lookahead = lookahead or 2 * self.max_workers
+
+    def _plan(self, paths):
+        """Page ranges to extract: (doc index, path, start, stop, page count) or (doc index, path, error)"""
+        tasks = []
+        for doc_index, path in enumerate(paths):
+            try:
+                count = page_count(path)
+            except Exception as e:
+                tasks.append((doc_index, path, e))
+                continue
+            for start in range(0, count, self.pages_per_task):
+                tasks.append((doc_index, path, start, min(start + self.pages_per_task, count), count))
+        return tasks
+
+    def iter_pages(self, paths):
+        """
+        Stream the pages of every PDF, in input order
+        Yields: (doc index, page number, page count, page text); a document that
+                cannot be read yields one (doc index, None, 0, exception) item instead
+        """
+        tasks = self._plan(paths)
+        ranges = sum(1 for task in tasks if len(task) == 5)
+        if self.max_workers == 1 or ranges <= 1:
+            yield from self._iter_serial(tasks)
+        else:
+            with self.workers.session():
+                yield from self._iter_pooled(tasks)
+
+    def _iter_serial(self, tasks):
+        for task in tasks:
+            if len(task) == 3:
+                yield task[0], None, 0, task[2]
+                continue
+            doc_index, path, start, stop, count = task
+            try:
+                for page_num, text in enumerate(iter_pages(path, start, stop), start):
+                    yield doc_index, page_num, count, text
+            except Exception as e:
+                yield doc_index, None, 0, e
+
+    def _iter_pooled(self, tasks):
+        pending = deque()
+        upcoming = iter(tasks)
+        failed = set()
+        retried = False
+
+        def submit(task):
+            if len(task) == 3:
+                return None
+            try:
+                return self.workers.executor().submit(_extract_task, task[1:4])
+            except BrokenProcessPool as e:
+                # Surfaces when this range's result is read, like a crash while it runs
+                broken = Future()
+                broken.set_exception(e)
+                return broken
+
+        def submit_next():
+            for task in upcoming:
+                pending.append((task, submit(task)))
+                return True
+            return False
+
+        while len(pending) < self.lookahead and submit_next():
+            pass
+
+        while pending:
+            task, future = pending.popleft()
+            doc_index = task[0]
+            if doc_index in failed:
+                submit_next()
+                continue
+            try:
+                result = task[2] if future is None else future.result()
+            except BrokenProcessPool:
+                self.workers.discard()
+                if retried:
+                    raise
+                # Every range in flight was lost with the pool: resubmit them
+                retried = True
+                print("⚠️ A PDF extraction worker died; restarting the pool and retrying")
+                pending.appendleft((task, future))
+                resubmitted = [(task, submit(task)) for task, _ in pending]
+                pending.clear()
+                pending.extend(resubmitted)
+                continue
+            submit_next()
+            if isinstance(result, Exception):
+                failed.add(doc_index)
+                yield doc_index, None, 0, result
+                continue
+            for page_num, text in enumerate(result, task[2]):
+                yield doc_index, page_num, task[4], text
+
+    def extract(self, paths):
+        """
+        Page texts of every PDF
+        Returns: List aligned with paths; each entry is the list of page texts,
+                 or the exception raised while reading that document
+        """
+        results = [[] for _ in paths]
+        for doc_index, _, _, text in self.iter_pages(paths):
+            if isinstance(text, Exception):
+                results[doc_index] = text
+            elif isinstance(results[doc_index], list):
+                results[doc_index].append(text)
+        return results
+
+    def close(self):
+        self.workers.close()
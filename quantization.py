@@ -0,0 +1,365 @@
+# quantization.py
+"""
+Compact storage for the embedding matrix
+- RowBuffer: over-allocated row array appended to in place and shared between snapshots
+- QuantizedMatrix: float32 / float16 / int8 (per-dimension scale + offset) rows that can be scored directly
+- DiskBackedMatrix: append-only float32 matrix memory-mapped from disk, used for exact rescoring
+"""
+
+import os
+import tempfile
+import threading
+import weakref
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+
+# Rows dequantized at a time while scoring, to bound temporary memory
+_BLOCK_ROWS = 8_192
+
+# int8 calibration: extra range added when it is (re)computed, and the
+# smallest half-width of a dimension's range
+_INT8_HEADROOM = 0.1
+_INT8_MIN_HALF_RANGE = 0.01
+
+# Capacity growth factor of RowBuffer, and its smallest allocation
+_GROWTH = 1.5
+_MIN_CAPACITY = 1_024
+
+
+class RowBuffer:
+    """
+    Rows kept in an over-allocated array whose capacity grows geometrically.
+
+    Appending writes into the spare capacity, so the existing rows are only
+    copied when it runs out. copy() shares the array: each copy sees its own
+    row prefix as a view, and rows past it are unused by anyone else as long
+    as the copy is the longest user of the array. A copy that is not (e.g. an
+    older snapshot) moves to a new array before appending, the same scheme
+    DiskBackedMatrix uses for its file.
+    """
+
+    def __init__(self, reserve=0):
+        self._buffer = None
+        self._extent = [0]  # rows written to the shared array, by any copy
+        self._reserve = reserve
+        self.rows = 0
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def array(self):
+        """View of this copy's rows (None before the first append)"""
+        return None if self._buffer is None else self._buffer[:self.rows]
+
+    @property
+    def capacity(self):
+        return 0 if self._buffer is None else self._buffer.shape[0]
+
+    def copy(self):
+        clone = RowBuffer()
+        clone._buffer, clone._extent, clone.rows = self._buffer, self._extent, self.rows
+        return clone
+
+    def append(self, rows):
+        count = rows.shape[0]
+        buffer = self._buffer
+        if buffer is None or self.rows != self._extent[0] or self.rows + count > self.capacity:
+            capacity = max(self.rows + count, int(self.capacity * _GROWTH), _MIN_CAPACITY, self._reserve)
+            grown = np.empty((capacity,) + rows.shape[1:], dtype=rows.dtype)
+            if self.rows:
+                grown[:self.rows] = buffer[:self.rows]
+            self._buffer = buffer = grown
+            self._extent = [self.rows]
+        buffer[self.rows:self.rows + count] = rows
+        self.rows += count
+        self._extent[0] = self.rows
+
+    def memory_bytes(self):
+        """Bytes allocated, including spare capacity"""
+        return 0 if self._buffer is None else self._buffer.nbytes
+
+
+class QuantizedMatrix:
+    """
+    Embedding rows stored at a selectable precision.
+
+    float32: 4 bytes/dim, exact
+    float16: 2 bytes/dim, ~3 significant digits
+    int8:    1 byte/dim; each dimension j is stored as code * scale[j] + offset[j]
+             with codes in [-127, 127]. Scale and offset are calibrated on the
+             first batch of vectors; a later batch outside that range widens it
+             and the stored rows are re-encoded, so nothing is ever clipped.
+
+    Scores are computed on the compact form: for int8,
+    x·q = codes·(scale*q) + offset·q, evaluated in blocks of rows.
+
+    Rows live in a RowBuffer, so appends are amortized and copies share them.
+    """
+
+    def __init__(self, precision="float32"):
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown embedding precision: {precision} (choose from {PRECISIONS})")
+        self.precision = precision
+        self._rows = RowBuffer()
+        self.scale = None
+        self.offset = None
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def data(self):
+        """The stored (encoded) rows, None while empty"""
+        return self._rows.array
+
+    def copy(self):
+        """Copy that can be appended to without affecting this matrix"""
+        clone = QuantizedMatrix(self.precision)
+        clone._rows = self._rows.copy()
+        clone.scale, clone.offset = self.scale, self.offset
+        return clone
+
+    def set(self, vectors):
+        """Replace all rows (recalibrates int8 scale/offset)"""
+        self._rows = RowBuffer()
+        self.scale = None
+        self.offset = None
+        self.append(vectors)
+
+    def append(self, vectors):
+        """Quantize and append float32 rows"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.precision == "int8" and len(vectors):
+            self._calibrate(vectors)
+
+        self._rows.append(self._encode(vectors))
+
+    def _calibrate(self, vectors):
+        """
+        Make the int8 range of every dimension cover vectors
+        A batch outside the current range widens it (with headroom, so this
+        stays rare as the corpus grows) and the stored rows are re-encoded
+        from their decoded values, one block at a time, into a new buffer
+        (copies sharing the old one keep their rows and calibration)
+        """
+        low, high = vectors.min(axis=0), vectors.max(axis=0)
+        if self.scale is not None:
+            current_low = self.offset - 127 * self.scale
+            current_high = self.offset + 127 * self.scale
+            if (low >= current_low).all() and (high <= current_high).all():
+                return
+            low, high = np.minimum(low, current_low), np.maximum(high, current_high)
+
+        # A single vector (e.g. a one-chunk first document) has an empty range
+        half_range = np.maximum((high - low) / 2 * (1 + _INT8_HEADROOM), _INT8_MIN_HALF_RANGE)
+        previous = (self.data, self.scale, self.offset)
+        self.offset = ((high + low) / 2).astype(np.float32)
+        self.scale = (half_range / 127).astype(np.float32)
+
+        data, scale, offset = previous
+        if data is not None:
+            self._rows = RowBuffer(reserve=self._rows.capacity)
+            for start in range(0, data.shape[0], _BLOCK_ROWS):
+                self._rows.append(self._encode(data[start:start + _BLOCK_ROWS].astype(np.float32) * scale + offset))
+
+    def _encode(self, vectors):
+        if self.precision == "float32":
+            return vectors
+        if self.precision == "float16":
+            return vectors.astype(np.float16)
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def _decode(self, block):
+        if self.precision == "int8":
+            return block.astype(np.float32) * self.scale + self.offset
+        return block.astype(np.float32, copy=False)
+
+    def rows(self, ids):
+        """Dequantized float32 copies of the given rows"""
+        return self._decode(self.data[ids])
+
+    def scores(self, query, ids=None):
+        """Approximate dot products of the query with all rows (or only the given ids)"""
+        query = np.asarray(query, dtype=np.float32)
+        source = self.data if ids is None else self.data[ids]
+
+        if self.precision == "float32":
+            return source @ query
+
+        if self.precision == "int8":
+            scaled_query = self.scale * query
+            bias = float(self.offset @ query)
+        out = np.empty(source.shape[0], dtype=np.float32)
+
+        for start in range(0, source.shape[0], _BLOCK_ROWS):
+            block = source[start:start + _BLOCK_ROWS].astype(np.float32)
+            if self.precision == "int8":
+                out[start:start + _BLOCK_ROWS] = block @ scaled_query + bias
+            else:
+                out[start:start + _BLOCK_ROWS] = block @ query
+        return out
+
+    def scores_many(self, queries):
+        """
+        Approximate dot products of several queries with all rows
+        Returns: (num_queries, rows) matrix, computed as one matrix-matrix
+                 product (per block of rows for float16/int8)
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.precision == "float32":
+            return queries @ self.data.T
+
+        if self.precision == "int8":
+            scaled_queries = queries * self.scale
+            bias = queries @ self.offset
+        out = np.empty((queries.shape[0], self.data.shape[0]), dtype=np.float32)
+
+        for start in range(0, self.data.shape[0], _BLOCK_ROWS):
+            block = self.data[start:start + _BLOCK_ROWS].astype(np.float32)
+            if self.precision == "int8":
+                out[:, start:start + _BLOCK_ROWS] = scaled_queries @ block.T + bias[:, None]
+            else:
+                out[:, start:start + _BLOCK_ROWS] = queries @ block.T
+        return out
+
+    def memory_bytes(self):
+        """Bytes held in RAM by the row buffer and calibration vectors"""
+        total = self._rows.memory_bytes()
+        if self.scale is not None:
+            total += self.scale.nbytes + self.offset.nbytes
+        return total
+
+
+# Backing files of DiskBackedMatrix: "embeddings-<pid>-<random>.f32"
+_FILE_PREFIX = "embeddings-"
+_FILE_SUFFIX = ".f32"
+
+# Bookkeeping of this process's backing files: files not deleted yet, live
+# memory maps per file, and files whose deletion failed while they were mapped
+# (Windows refuses to delete those) and is retried when the last map goes away
+_files_lock = threading.Lock()
+_live_files = set()
+_map_counts = {}
+_deferred = set()
+
+
+def _remove_file(path):
+    """Delete a backing file, or retry once its last memory map is released"""
+    with _files_lock:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            if _map_counts.get(path):
+                _deferred.add(path)
+            return
+        _deferred.discard(path)
+        _live_files.discard(path)
+
+
+def _release_map(path):
+    with _files_lock:
+        _map_counts[path] -= 1
+        if _map_counts[path]:
+            return
+        del _map_counts[path]
+        retry = path in _deferred
+    if retry:
+        _remove_file(path)
+
+
+def _process_alive(pid):
+    if os.name == "nt":
+        # Files still mapped by a running process cannot be deleted on Windows anyway
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove_stale_files(directory):
+    """
+    Delete backing files left behind in directory, e.g. by a crashed run or
+    by a deletion that Windows refused while the file was still mapped
+    Files of this process's live matrices and of running processes are kept
+    Returns: Number of files deleted
+    """
+    if not os.path.isdir(directory):
+        return 0
+    removed = 0
+    for name in os.listdir(directory):
+        if not (name.startswith(_FILE_PREFIX) and name.endswith(_FILE_SUFFIX)):
+            continue
+        path = os.path.abspath(os.path.join(directory, name))
+        with _files_lock:
+            if path in _live_files:
+                continue
+        owner = name[len(_FILE_PREFIX):].split("-", 1)[0]
+        if owner.isdigit() and int(owner) != os.getpid() and _process_alive(int(owner)):
+            continue
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+class DiskBackedMatrix:
+    """
+    Append-only float32 matrix kept in a file and memory-mapped read-only.
+
+    Only the pages of rows that are actually read (e.g. rescoring candidates)
+    are brought into memory, so full precision is available without holding
+    the whole matrix in RAM. A matrix is never rewritten: replacing the
+    embeddings creates a new one, so snapshots still reading the old file keep
+    it. The file is deleted when the matrix object is garbage collected; where
+    a mapped file cannot be deleted (Windows), deletion is retried when its
+    last map is released. Files left over by a crash are swept by
+    remove_stale_files().
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = self._new_file()
+        self.rows = 0
+        self.dim = None
+        self.array = None
+
+    def _new_file(self):
+        os.makedirs(self.directory, exist_ok=True)
+        handle, path = tempfile.mkstemp(prefix=f"{_FILE_PREFIX}{os.getpid()}-", suffix=_FILE_SUFFIX,
+                                        dir=self.directory)
+        os.close(handle)
+        path = os.path.abspath(path)
+        with _files_lock:
+            _live_files.add(path)
+        weakref.finalize(self, _remove_file, path)
+        return path
+
+    def append(self, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with open(self.path, "ab") as f:
+            f.write(vectors.tobytes())
+        self.rows += vectors.shape[0]
+        self.dim = vectors.shape[1]
+        self._map()
+
+    def _map(self):
+        if self.rows == 0:
+            self.array = None
+            return
+        self.array = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.dim))
+        # Views share the underlying mmap object, so the map is released with it
+        mapping = getattr(self.array, "_mmap", None)
+        with _files_lock:
+            _map_counts[self.path] = _map_counts.get(self.path, 0) + 1
+        weakref.finalize(mapping if mapping is not None else self.array, _release_map, self.path)
@@ -0,0 +1,315 @@
+# query_cache.py
+"""
+In-memory caches for the question answering path
+- QueryEmbeddingCache: LRU + TTL cache of query embeddings, independent of the corpus
+- AnswerCache: LRU cache of answers, keyed by query, retrieval parameters and corpus version
+- SemanticAnswerCache: serves cached retrieval results to paraphrases via query-embedding similarity
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+def normalize_query(query):
+    """Lowercase and collapse whitespace so trivially different questions share a key"""
+    return " ".join(query.lower().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings keyed by (model name, normalized query).
+
+    Entries expire after ttl_seconds. The cache does not depend on the corpus,
+    so one process-wide instance survives engine re-initialisation. Every hit
+    is credited with the running average encode time as "saved" time.
+    """
+
+    def __init__(self, max_entries=2048, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def get_or_encode(self, model_name, query, encode):
+        """
+        Return the cached embedding of query, or compute it with encode(text)
+        encode receives the normalized query text
+        """
+        text = normalize_query(query)
+        key = (model_name, text)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                if self.misses:
+                    self.saved_seconds += self.encode_seconds / self.misses
+                return entry[0]
+
+        start = time.perf_counter()
+        embedding = encode(text)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.misses += 1
+            self.encode_seconds += elapsed
+            self._store(key, embedding, now)
+        return embedding
+
+    def get_or_encode_many(self, model_name, queries, encode_batch):
+        """
+        Embeddings of several queries, in order
+        Cache misses are computed with a single encode_batch(texts) call, which
+        receives the distinct normalized queries and returns one vector per text
+        """
+        texts = [normalize_query(query) for query in queries]
+        now = time.monotonic()
+        embeddings = [None] * len(texts)
+
+        with self._lock:
+            for i, text in enumerate(texts):
+                entry = self._entries.get((model_name, text))
+                if entry is not None and now - entry[1] <= self.ttl_seconds:
+                    self._entries.move_to_end((model_name, text))
+                    self.hits += 1
+                    if self.misses:
+                        self.saved_seconds += self.encode_seconds / self.misses
+                    embeddings[i] = entry[0]
+
+        missing = list(dict.fromkeys(text for text, embedding in zip(texts, embeddings) if embedding is None))
+        if missing:
+            start = time.perf_counter()
+            encoded = dict(zip(missing, encode_batch(missing)))
+            elapsed = time.perf_counter() - start
+
+            with self._lock:
+                self.misses += len(missing)
+                self.encode_seconds += elapsed
+                for text, embedding in encoded.items():
+                    self._store((model_name, text), embedding, now)
+            embeddings = [encoded[text] if embedding is None else embedding for text, embedding in zip(texts, embeddings)]
+        return embeddings
+
+    def _store(self, key, embedding, now):
+        """Insert an entry and evict the least recently used ones (lock held)"""
+        self._entries[key] = (embedding, now)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Hit rate and encode time saved, for /status"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "saved_encode_seconds": round(self.saved_seconds, 3)
+            }
+
+
+# Shared by every engine in this process; survives engine re-initialisation
+query_embedding_cache = QueryEmbeddingCache()
+
+
+class AnswerCache:
+    """
+    LRU cache of /ask answers keyed by (normalized query, top_k, threshold, corpus version).
+
+    The corpus version changes on every ingest, removal or clear, so a cached
+    answer is only ever served for the exact corpus it was computed on. Memory
+    is bounded both by entry count and by the total size of cached answers.
+    """
+
+    def __init__(self, max_entries=1024, max_chars=8_000_000):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self._entries = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(query, top_k, threshold, corpus_version):
+        return (normalize_query(query), top_k, float(threshold), corpus_version)
+
+    def get(self, key):
+        """Cached answer for key, or None"""
+        with self._lock:
+            answer = self._entries.get(key)
+            if answer is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return answer
+
+    def put(self, key, answer):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._chars -= len(previous)
+            self._entries[key] = answer
+            self._chars += len(answer)
+            while self._entries and (len(self._entries) > self.max_entries or self._chars > self.max_chars):
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def discard_versions_before(self, corpus_version):
+        """Drop entries computed on older corpora (they can never be hit again)"""
+        with self._lock:
+            stale = [key for key in self._entries if key[3] < corpus_version]
+            for key in stale:
+                self._chars -= len(self._entries.pop(key))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "chars": self._chars,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Answers of the /ask endpoint, shared across engine re-initialisation
+answer_cache = AnswerCache()
+
+
+# Default paraphrase radius (cosine distance) of SemanticAnswerCache. With the
+# default encoder (all-mpnet-base-v2), reworded questions asking the same
+# thing typically lie 0.04-0.12 apart, while different questions about the
+# same topic are mostly 0.2 or more apart; 0.12 serves most paraphrases and
+# stays clear of those. Re-measure with benchmarks/bench_paraphrase.py when
+# changing the encoder.
+DEFAULT_PARAPHRASE_DISTANCE = 0.12
+
+
+class SemanticAnswerCache:
+    """
+    Near-duplicate question cache: reuses the retrieval result of a recent
+    question whose embedding is within max_distance (cosine distance) of the
+    new one.
+
+    Results are the unhighlighted (chunks, highlight) of
+    QueryFluxEngine.retrieve, so each request highlights its own words.
+
+    Entries live in a fixed-size slot matrix of unit-norm query embeddings,
+    which doubles as the cache's vector index: a lookup is one matrix-vector
+    product over at most max_entries rows, masked to entries with the same
+    retrieval parameters and corpus version. When full, the least recently
+    used slot is overwritten.
+    """
+
+    def __init__(self, max_entries=512, max_distance=DEFAULT_PARAPHRASE_DISTANCE):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._meta = [None] * max_entries   # (params, result) per slot
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _params(top_k, threshold, corpus_version):
+        return (top_k, float(threshold), corpus_version)
+
+    @staticmethod
+    def _unit(embedding):
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, embedding, top_k, threshold, corpus_version):
+        """Cached result of the most similar matching question, or None"""
+        params = self._params(top_k, threshold, corpus_version)
+        with self._lock:
+            if self._vectors is None:
+                self.misses += 1
+                return None
+
+            eligible = np.array([meta is not None and meta[0] == params for meta in self._meta])
+            if not eligible.any():
+                self.misses += 1
+                return None
+
+            similarities = self._vectors @ self._unit(embedding)
+            similarities[~eligible] = -np.inf
+            best = int(np.argmax(similarities))
+            if 1.0 - similarities[best] > self.max_distance:
+                self.misses += 1
+                return None
+
+            self._clock += 1
+            self._last_used[best] = self._clock
+            self.hits += 1
+            return self._meta[best][1]
+
+    def put(self, embedding, top_k, threshold, corpus_version, result):
+        vector = self._unit(embedding)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+            free = [i for i, meta in enumerate(self._meta) if meta is None]
+            slot = free[0] if free else int(np.argmin(self._last_used))
+
+            self._clock += 1
+            self._vectors[slot] = vector
+            self._meta[slot] = (self._params(top_k, threshold, corpus_version), result)
+            self._last_used[slot] = self._clock
+
+    def discard_versions_before(self, corpus_version):
+        """Free the slots of results computed on older corpora"""
+        with self._lock:
+            for i, meta in enumerate(self._meta):
+                if meta is not None and meta[0][2] < corpus_version:
+                    self._meta[i] = None
+                    self._last_used[i] = 0
+
+    def clear(self):
+        with self._lock:
+            self._meta = [None] * self.max_entries
+            self._last_used[:] = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": sum(meta is not None for meta in self._meta),
+                "max_entries": self.max_entries,
+                "max_distance": self.max_distance,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+# Paraphrase-level retrieval cache for /ask
+semantic_answer_cache = SemanticAnswerCache()
@@ -1,47 +1,240 @@
 # summarizer.py
 """
-Extractive text summarization using TF-IDF and cosine similarity
-Extracts the most important sentences from the text
+Extractive text summarization
+Sentences are ranked by a pluggable engine and the best ones are returned in original order
+- tfidf: summed TF-IDF cosine similarity (centroid or dense pairwise scoring)
+- lexrank: LexRank centrality on a thresholded sparse similarity graph
+- embedding: cosine similarity to the centroid of sentence embeddings
+- sumy-lexrank / sumy-textrank / sumy-lsa: sumy backends, when sumy is installed
+  (pure Python and quadratic: above SUMY_MAX_SENTENCES, lexrank is used instead)
+HierarchicalSummarizer summarizes large corpora section by section (map) and
+then summarizes the summaries (reduce) in a process pool
 """
 
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
+import scipy.sparse as sp
+from lexical_index import TOKEN_PATTERN
+from worker_pool import WorkerPool
 
+try:
+    from sumy.models.dom import ObjectDocumentModel, Paragraph, Sentence
+    from sumy.summarizers.lex_rank import LexRankSummarizer
+    from sumy.summarizers.lsa import LsaSummarizer
+    from sumy.summarizers.text_rank import TextRankSummarizer
+except ImportError:  # sumy is optional
+    Sentence = None
 
-def summarize_text(text, num_sentences=5):
+SCORING_MODES = ("centroid", "pairwise")
+
+# Above this many sentences the dense (S x S) similarity matrix is never built
+PAIRWISE_MAX_SENTENCES = 2_000
+
+# Above this many sentences the sumy backends hand over to the sparse lexrank engine
+SUMY_MAX_SENTENCES = 500
+
+
+def split_sentences(text):
+    """Split text on '.' and keep sentences longer than 10 characters"""
+    sentences = text.split('.')
+    return [s.strip() for s in sentences if len(s.strip()) > 10]
+
+
+def sentence_scores(tfidf_matrix, scoring="centroid"):
+    """
+    Importance of each sentence: the sum of its cosine similarities to all sentences
+
+    TfidfVectorizer rows are L2-normalised, so the row sums of the cosine matrix
+    X·Xᵀ equal X·(Σ rows of X). "centroid" computes exactly that with one sparse
+    matrix-vector product in O(nnz); "pairwise" builds the dense S x S matrix.
+    """
+    if scoring == "pairwise":
+        return cosine_similarity(tfidf_matrix).sum(axis=1)
+    if scoring == "centroid":
+        centroid = np.asarray(tfidf_matrix.sum(axis=0)).ravel()
+        return np.asarray(tfidf_matrix @ centroid).ravel()
+    raise ValueError(f"Unknown scoring mode: {scoring} (choose from {SCORING_MODES})")
+
+
+def top_sentences(scores, num_sentences):
+    """Indices of the num_sentences best scores, in original order"""
+    return sorted(np.argsort(scores)[-num_sentences:])
+
+
+# ---------------------------------------------------------------------------
+# Engines: fn(sentences, num_sentences, **options) -> indices of chosen sentences
+# ---------------------------------------------------------------------------
+
+def tfidf_engine(sentences, num_sentences, scoring="centroid"):
+    if scoring == "pairwise" and len(sentences) > PAIRWISE_MAX_SENTENCES:
+        print(f"⚠️ {len(sentences)} sentences: using centroid scoring instead of pairwise")
+        scoring = "centroid"
+    tfidf_matrix = TfidfVectorizer().fit_transform(sentences)
+    return top_sentences(sentence_scores(tfidf_matrix, scoring), num_sentences)
+
+
+def similarity_graph(tfidf_matrix, threshold=0.1, block_rows=1_024):
+    """
+    Sparse sentence similarity graph keeping only edges with cosine >= threshold
+    Built in row blocks so the unthresholded product never exists in full
+    """
+    matrix = sp.csr_matrix(tfidf_matrix)
+    transposed = matrix.T.tocsc()
+    blocks = []
+    for start in range(0, matrix.shape[0], block_rows):
+        block = (matrix[start:start + block_rows] @ transposed).tocsr()
+        block.data[block.data < threshold] = 0
+        block.eliminate_zeros()
+        blocks.append(block)
+    return sp.vstack(blocks, format="csr")
+
+
+def lexrank_scores(graph, damping=0.85, tol=1e-6, max_iter=100):
+    """Stationary distribution of a damped random walk on the (weighted) graph"""
+    n = graph.shape[0]
+    degree = np.asarray(graph.sum(axis=1)).ravel()
+    degree[degree == 0] = 1.0
+    transition_t = (sp.diags(1.0 / degree) @ graph).T.tocsr()
+
+    scores = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        updated = (1 - damping) / n + damping * (transition_t @ scores)
+        if np.abs(updated - scores).sum() < tol:
+            return updated
+        scores = updated
+    return scores
+
+
+def lexrank_engine(sentences, num_sentences, threshold=0.1, damping=0.85, max_df=0.5):
+    # Terms in more than max_df of all sentences link almost everything to everything
+    tfidf_matrix = TfidfVectorizer(stop_words="english", max_df=max_df).fit_transform(sentences)
+    graph = similarity_graph(tfidf_matrix, threshold)
+    return top_sentences(lexrank_scores(graph, damping), num_sentences)
+
+
+def mmr_select(vectors, relevance, k, diversity):
+    """
+    Maximal marginal relevance: greedily pick the row maximising
+    (1 - diversity) * relevance - diversity * (max similarity to rows already picked)
+    Costs one matrix-vector product per pick
     """
-    Generate an extractive summary of the text using TF-IDF
+    k = min(k, len(relevance))
+    chosen = [int(np.argmax(relevance))]
+    redundancy = vectors @ vectors[chosen[0]]
+    for _ in range(k - 1):
+        gain = (1 - diversity) * relevance - diversity * redundancy
+        gain[chosen] = -np.inf
+        best = int(np.argmax(gain))
+        chosen.append(best)
+        redundancy = np.maximum(redundancy, vectors @ vectors[best])
+    return sorted(chosen)
+
+
+def embedding_engine(sentences, num_sentences, encode=None, vectors=None, diversity=0.0, query=None):
+    """
+    Rank by cosine similarity to the centroid of the sentence embeddings,
+    or to the query embedding if one is given (query-focused summary)
+    vectors: precomputed embeddings of the sentences (e.g. the engine's chunk embeddings),
+             otherwise encode(list_of_texts) is called
+    diversity: MMR trade-off in [0, 1); 0 keeps plain similarity ranking
+    """
+    if vectors is None:
+        if encode is None:
+            raise ValueError("The embedding summarizer needs vectors or an encode function")
+        vectors = encode(sentences)
+    vectors = np.array(vectors, dtype=np.float32)
+    norms = np.sqrt(np.einsum("ij,ij->i", vectors, vectors))  # no (S x d) temporary
+    norms[norms == 0] = 1.0
+    vectors /= norms[:, None]
+
+    target = vectors.sum(axis=0) if query is None else np.asarray(query, dtype=np.float32).reshape(-1)
+    target = target / (np.linalg.norm(target) or 1.0)
+    relevance = vectors @ target
+    if diversity > 0:
+        return mmr_select(vectors, relevance, num_sentences, diversity)
+    return top_sentences(relevance, num_sentences)
+
+
+class _WordTokenizer:
+    """Word splitter for sumy sentences (avoids needing NLTK punkt data)"""
+
+    @staticmethod
+    def to_words(text):
+        return TOKEN_PATTERN.findall(text)
+
+
+def _sumy_engine(summarizer_class):
+    def engine(sentences, num_sentences):
+        if len(sentences) > SUMY_MAX_SENTENCES:
+            print(f"⚠️ {len(sentences)} sentences: using lexrank instead of {summarizer_class.__name__}")
+            return lexrank_engine(sentences, num_sentences)
+        tokenizer = _WordTokenizer()
+        parsed = [Sentence(s, tokenizer) for s in sentences]
+        document = ObjectDocumentModel([Paragraph(parsed)])
+        # sumy compares sentences by text, so map results back by object identity
+        positions = {id(s): i for i, s in enumerate(parsed)}
+        chosen = summarizer_class()(document, num_sentences)
+        return sorted(positions[id(s)] for s in chosen)
+    return engine
+
+
+SUMMARIZERS = {
+    "tfidf": tfidf_engine,
+    "lexrank": lexrank_engine,
+    "embedding": embedding_engine,
+}
+
+if Sentence is not None:
+    SUMMARIZERS.update({
+        "sumy-lexrank": _sumy_engine(LexRankSummarizer),
+        "sumy-textrank": _sumy_engine(TextRankSummarizer),
+        "sumy-lsa": _sumy_engine(LsaSummarizer),
+    })
+
+DEFAULT_METHOD = "tfidf"
+
+
+def summarize_text(text, num_sentences=5, method=DEFAULT_METHOD, fallback="lead", **options):
+    """
+    Generate an extractive summary of the text
     
     Args:
         text: Input text to summarize
         num_sentences: Number of sentences to include in summary
+        method: Summarizer engine, one of SUMMARIZERS
+        fallback: "lead" returns the first sentences if the engine fails,
+                  None re-raises the error
+        **options: Engine options, e.g. scoring="pairwise" for tfidf,
+                   threshold for lexrank, encode for embedding
     
     Returns:
         Summary text with the most important sentences
     """
     # Split text into sentences
-    sentences = text.split('.')
-    sentences = [s.strip() for s in sentences if len(s.strip()) > 10]
+    return summarize_sentences(split_sentences(text), num_sentences, method, fallback, **options)
+
+
+def summarize_sentences(sentences, num_sentences=5, method=DEFAULT_METHOD, fallback="lead", **options):
+    """
+    Summarize text that is already split into sentences (or chunks), so
+    per-sentence options such as precomputed vectors line up with the input
+    """
+    if method not in SUMMARIZERS:
+        raise ValueError(f"Unknown summarizer: {method} (choose from {sorted(SUMMARIZERS)})")
+
+    sentences = [s.strip().rstrip('.') for s in sentences]
 
     # If text is shorter than requested summary, return full text
     if len(sentences) <= num_sentences:
         return '. '.join(sentences)
 
     try:
-        # Vectorize sentences using TF-IDF
-        vectorizer = TfidfVectorizer()
-        tfidf_matrix = vectorizer.fit_transform(sentences)
-        
-        # Calculate cosine similarity
-        similarity_matrix = cosine_similarity(tfidf_matrix)
-        
-        # Calculate importance scores by summing similarities
-        importance_scores = similarity_matrix.sum(axis=1)
-        
-        # Get indices of top sentences
-        top_indices = np.argsort(importance_scores)[-num_sentences:]
-        top_indices = sorted(top_indices)  # Maintain original order
+        top_indices = SUMMARIZERS[method](sentences, num_sentences, **options)
         
         # Construct summary
         summary_sentences = [sentences[i] for i in top_indices]
@@ -50,6 +243,147 @@ def summarize_text(text, num_sentences=5):
         return summary
         
     except Exception as e:
-        print(f"Error during summarization: {str(e)}")
+        if fallback is None:
+            raise
+        print(f"Error during summarization ({method}): {str(e)}")
         # Fallback: return first num_sentences
         return '. '.join(sentences[:num_sentences]) + '.'
+
+
+def _summarize_section(args):
+    """Map task run in a worker process"""
+    text, num_sentences, method = args
+    return summarize_text(text, num_sentences, method)
+
+
+class HierarchicalSummarizer:
+    """
+    Map-reduce summarization with bounded memory.
+
+    Map: the chunks of each document are grouped into sections of at most
+    section_chars characters and every section is summarized independently,
+    in a process pool. Reduce: the section summaries are grouped and
+    summarized again until one summary per document remains; the corpus
+    summary is the reduce of the document summaries.
+
+    No vectorizer ever sees more than one section. Every intermediate summary
+    is cached by a hash of (method, num_sentences, section text), so after a
+    document is added only its own sections and the reduce steps above them
+    are recomputed.
+
+    The pool (see worker_pool.WorkerPool) is started on first use, shut down
+    after a minute without summarization, and replaced if a worker dies; the
+    sections of that step are retried once.
+    """
+
+    def __init__(self, num_sentences=5, section_chars=20_000, max_workers=None, cache_entries=20_000):
+        self.num_sentences = num_sentences
+        self.section_chars = section_chars
+        self.workers = WorkerPool(max_workers)
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.computed = 0   # sections summarized (cache misses)
+        self.reused = 0     # sections served from the cache
+
+    def sections(self, texts):
+        """Group consecutive texts into sections of at most section_chars characters"""
+        sections, current, size = [], [], 0
+        for text in texts:
+            if current and size + len(text) > self.section_chars:
+                sections.append(" ".join(current))
+                current, size = [], 0
+            current.append(text)
+            size += len(text) + 1
+        if current:
+            sections.append(" ".join(current))
+        return sections
+
+    def _key(self, text, method):
+        return hashlib.sha256(f"{method}\0{self.num_sentences}\0{text}".encode("utf-8")).hexdigest()
+
+    def summarize_sections(self, sections, method=DEFAULT_METHOD):
+        """Summaries of the given sections, computing cache misses in parallel"""
+        keys = [self._key(text, method) for text in sections]
+        with self._lock:
+            results = [self._cache.get(key) for key in keys]
+            for key, result in zip(keys, results):
+                if result is not None:
+                    self._cache.move_to_end(key)
+
+        # Each distinct missing section is summarized once
+        missing = list(dict.fromkeys((key, text) for key, text, result in zip(keys, sections, results) if result is None))
+        tasks = [(text, self.num_sentences, method) for _, text in missing]
+        if len(tasks) > 1:
+            computed = self._map(tasks)
+        else:
+            computed = [_summarize_section(task) for task in tasks]
+
+        with self._lock:
+            for (key, _), summary in zip(missing, computed):
+                self._cache[key] = summary
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+            self.computed += len(missing)
+            self.reused += len(sections) - len(missing)
+        by_key = {key: summary for (key, _), summary in zip(missing, computed)}
+        return [result if result is not None else by_key[key] for key, result in zip(keys, results)]
+
+    def _reduce(self, summaries, method):
+        """Summarize summaries level by level until one is left"""
+        while len(summaries) > 1:
+            # A sentence repeated across summaries would dominate the next level
+            sentences = dict.fromkeys(s for summary in summaries for s in split_sentences(summary))
+            sections = self.sections([f"{s}." for s in sentences])
+            if len(sections) >= len(summaries):
+                # Summaries too long to group: summarize them all in one step
+                sections = [" ".join(summaries)]
+            summaries = self.summarize_sections(sections, method)
+        return summaries[0] if summaries else ""
+
+    def summarize(self, texts, method=DEFAULT_METHOD):
+        """Hierarchical summary of a sequence of texts (e.g. the chunks of one document)"""
+        return self._reduce(self.summarize_sections(self.sections(texts), method), method)
+
+    def summarize_documents(self, documents, method=DEFAULT_METHOD):
+        """
+        Summarize several documents at once
+        Args:
+            documents: {name: [chunk texts]} in corpus order
+        Returns: (corpus summary, {name: document summary})
+        """
+        # One map step over the sections of every document keeps all workers busy
+        names = list(documents)
+        sections = [self.sections(documents[name]) for name in names]
+        flat = self.summarize_sections([text for doc in sections for text in doc], method)
+
+        per_document, start = {}, 0
+        for name, doc in zip(names, sections):
+            per_document[name] = self._reduce(flat[start:start + len(doc)], method)
+            start += len(doc)
+        return self._reduce(list(per_document.values()), method), per_document
+
+    def _map(self, tasks, retries=1):
+        """Run map tasks in the pool, starting a new pool if a worker died"""
+        try:
+            with self.workers.session():
+                executor = self.workers.executor()
+                return list(executor.map(_summarize_section, tasks, chunksize=max(1, len(tasks) // 32)))
+        except BrokenProcessPool:
+            self.workers.discard()
+            if not retries:
+                raise
+            print("⚠️ A summarization worker died; restarting the pool and retrying")
+            return self._map(tasks, retries - 1)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cached_sections": len(self._cache),
+                "computed": self.computed,
+                "reused": self.reused
+            }
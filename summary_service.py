@@ -0,0 +1,125 @@
+# summary_service.py
+"""
+Background corpus summarization
+Corpus and per-document summaries are computed once per corpus version in a
+worker thread, so /ask never blocks on summarization
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from summarizer import DEFAULT_METHOD, HierarchicalSummarizer, summarize_sentences
+
+
+class SummaryService:
+    """
+    Computes and caches summaries keyed by (corpus_version, summarizer method).
+
+    schedule() takes an index snapshot (see index_snapshot.IndexSnapshot),
+    which never changes, and summarizes it in a single background worker; get() returns the cached result for a version
+    or None while it is still pending. Only the latest version is kept:
+    scheduling a newer version cancels the queued jobs of older ones, and
+    queued jobs hold their snapshot here rather than in the worker queue,
+    so a cancelled job releases it (and its indexes) right away.
+
+    Text-based methods go through a HierarchicalSummarizer (map-reduce over
+    sections in a process pool, intermediate summaries cached by content), so
+    a new corpus version only recomputes the sections that changed.
+
+    The "embedding" method ranks whole chunks using the chunk embeddings the
+    engine already holds (centrality + MMR with the given diversity), so it
+    needs no new vectorisation pass.
+    """
+
+    def __init__(self, num_sentences=5, diversity=0.3):
+        self.num_sentences = num_sentences
+        self.diversity = diversity
+        self.hierarchical = HierarchicalSummarizer(num_sentences)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summarizer")
+        self._lock = threading.Lock()
+        self._results = {}     # (corpus_version, method) -> {"corpus": str, "documents": {filename: str}}
+        self._pending = {}     # (corpus_version, method) -> Future
+        self._snapshots = {}   # (corpus_version, method) -> snapshot of a job not started yet
+        self._latest = 0       # newest corpus version scheduled
+
+    def schedule(self, snapshot, method=DEFAULT_METHOD):
+        """Start summarizing the snapshot's corpus unless already done, running or superseded"""
+        key = (snapshot.version, method)
+        with self._lock:
+            if snapshot.version < self._latest or key in self._results or key in self._pending:
+                return
+            if snapshot.version > self._latest:
+                self._latest = snapshot.version
+                self._cancel(lambda k: k[0] < snapshot.version)
+            self._snapshots[key] = snapshot
+            self._pending[key] = self._executor.submit(self._summarize, key)
+
+    def _cancel(self, stale):
+        """Cancel the jobs whose key matches stale() and drop their snapshots (lock held)"""
+        for key in [k for k in self._pending if stale(k)]:
+            self._pending.pop(key).cancel()
+            self._snapshots.pop(key, None)
+
+    def _summarize(self, key):
+        with self._lock:
+            snapshot = self._snapshots.pop(key, None)
+        if snapshot is None:
+            return  # cancelled before it started
+        version, method = key
+        chunks = snapshot.chunks
+        sources = snapshot.chunk_sources
+        filenames = {digest: info["filename"] for digest, info in snapshot.documents.items()}
+        # Row i of the embedding matrix belongs to chunk i
+        vectors = snapshot.embeddings if method == "embedding" else None
+
+        try:
+            print(f"\n📄 Summarizing corpus v{version} ({method}) in the background...")
+            by_document = {}
+            for row, digest in enumerate(sources):
+                by_document.setdefault(digest, []).append(row)
+
+            if vectors is not None:
+                def summarize(rows):
+                    return summarize_sentences(
+                        [chunks[i] for i in rows], self.num_sentences, method,
+                        vectors=np.asarray(vectors[rows]), diversity=self.diversity
+                    )
+
+                result = {
+                    "corpus": summarize(list(range(len(chunks)))) if chunks else "",
+                    "documents": {filenames.get(digest, digest): summarize(rows) for digest, rows in by_document.items()}
+                }
+            else:
+                corpus, documents = self.hierarchical.summarize_documents({
+                    filenames.get(digest, digest): [chunks[i] for i in rows]
+                    for digest, rows in by_document.items()
+                }, method)
+                result = {"corpus": corpus, "documents": documents}
+            print(f"✓ Summaries ready for corpus v{version} ({method})")
+        except Exception as e:
+            print(f"✗ Summarization failed for corpus v{version} ({method}): {str(e)}")
+            result = {"corpus": "", "documents": {}, "error": str(e)}
+
+        with self._lock:
+            self._pending.pop(key, None)
+            # Summaries of older corpora can never be requested again
+            for old in [k for k in self._results if k[0] < version]:
+                del self._results[old]
+            if version >= self._latest:
+                self._results[key] = result
+
+    def get(self, corpus_version, method=DEFAULT_METHOD):
+        """Cached summaries for corpus_version and method, or None if not computed yet"""
+        with self._lock:
+            return self._results.get((corpus_version, method))
+
+    def clear(self):
+        """Drop all summaries and cancel the jobs that have not started"""
+        with self._lock:
+            self._cancel(lambda k: True)
+            self._results.clear()
+        self.hierarchical.clear()
+
+
+# Shared background summarizer for the web app
+summary_service = SummaryService()
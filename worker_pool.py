@@ -0,0 +1,88 @@
+# worker_pool.py
+"""
+Process pool for the extraction and summarization workers
+Started on first use, and shut down again once it has been idle for a while
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+# Workers used when a caller does not choose: each one is a full Python process
+# with its own imports, so the pool does not grow with the core count
+DEFAULT_MAX_WORKERS = min(os.cpu_count() or 1, 4)
+
+
+class WorkerPool:
+    """
+    Lazily started process pool that shuts down after idle_seconds without work.
+
+    Workers are spawned, not forked: the pool is started from a worker thread
+    of an already multithreaded process (Flask, torch). Callers hold a
+    session() while they use executor(); when the last session ends an idle
+    timer is armed, and a pool still unused when it fires is shut down so its
+    workers stop holding memory. A broken pool is dropped with discard().
+    """
+
+    def __init__(self, max_workers=None, idle_seconds=60.0):
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.idle_seconds = idle_seconds
+        self._executor = None
+        self._sessions = 0
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self):
+        """Keep the pool alive while the caller submits work and reads results"""
+        with self._lock:
+            self._sessions += 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._sessions -= 1
+                if not self._sessions and self._executor is not None:
+                    self._timer = threading.Timer(self.idle_seconds, self._shutdown_idle)
+                    self._timer.daemon = True
+                    self._timer.start()
+
+    def executor(self):
+        """The running pool, started if needed"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def discard(self):
+        """Drop a broken pool; the next executor() call starts a new one"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _shutdown_idle(self):
+        with self._lock:
+            # A session started, or a newer timer replaced this one, since it was armed
+            if self._sessions or self._timer is not threading.current_thread():
+                return
+            executor, self._executor, self._timer = self._executor, None, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def close(self):
+        """Shut the pool down now, waiting for its workers to exit"""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()